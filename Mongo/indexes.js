@@ -31,6 +31,11 @@ db.tickets.createIndex(
   { name: "idx_complex_filter" }
 )
 
+db.tickets.createIndex(
+  { "classifierPath": 1, "createdAt": 1 },
+  { name: "idx_classifierPath_createdAt" }
+)
+
 db.tickets.createIndex(
   { "history.timestamp": 1 },
   { name: "idx_history_timestamp" }
@@ -51,6 +56,27 @@ db.tickets.createIndex(
   { name: "idx_assignedTo_currentState" }
 )
 
+db.ticket_events.createIndex({ "timestamp": -1 }, { name: "idx_timestamp_desc" })
+
+db.ticket_events.createIndex(
+  { "classifierPath": 1, "timestamp": -1 },
+  { name: "idx_classifierPath_timestamp_desc" }
+)
+
+db.ticket_events.createIndex(
+  { "ticketId": 1, "seq": 1 },
+  { name: "idx_ticketId_seq" }
+)
+
+db.daily_stats.createIndex({ "day": 1 }, { name: "idx_day" })
+
+db.daily_stats.createIndex(
+  { "classifierPath": 1, "day": 1 },
+  { name: "idx_classifierPath_day" }
+)
+
+db.daily_stats.createIndex({ "state": 1, "day": 1 }, { name: "idx_state_day" })
+
 db.classifiers.createIndex({ "rootId": 1 }, { name: "idx_rootId" })
 
 db.classifiers.createIndex({ "parentId": 1 }, { name: "idx_parentId" })
@@ -64,6 +90,11 @@ db.classifiers.createIndex(
   { name: "idx_rootId_level" }
 )
 
+db.classifiers.createIndex(
+  { "level": 1, "name": 1 },
+  { name: "idx_level_name" }
+)
+
 print("\n" + "=".repeat(60))
 print("✅ ÍNDICES CREADOS EXITOSAMENTE")
 print("=".repeat(60))
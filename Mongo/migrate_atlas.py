@@ -1,150 +1,936 @@
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import DeleteOne, IndexModel, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import argparse
+import hashlib
+import os
+import queue
+import sys
+import threading
+import time
 
 SOURCE_URI = "SOURCE"
 TARGET_URI = "TARGET"
+DB_NAME = "capta_tickets"
+# Además de los datos base se copian las colecciones derivadas que lee el
+# dashboard (eventos, resumen diario y versión del árbol de clasificadores)
+COLECCIONES = ["tickets", "classifiers", "ticket_events", "daily_stats", "metadata"]
+
+# Los documentos se copian como BSON crudo, sin decodificarlos a dicts
+RAW_BSON = CodecOptions(document_class=RawBSONDocument)
+
+FIN = object()
+
+# Campos de list_indexes() que no son opciones de creación del índice
+CAMPOS_NO_OPCION = {"key", "v", "ns"}
+
+# Código de MongoDB cuando el resume token ya salió del oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# Eventos tras los cuales el change stream deja de poder replicarse
+EVENTOS_INVALIDANTES = ["drop", "rename", "dropDatabase", "invalidate"]
+
+_candado_checkpoint = threading.Lock()
+
+
+def confirmar(mensaje, asumir_si):
+    if asumir_si:
+        return True
+    return input(mensaje).lower() == "s"
+
+
+def conectar(uri, descripcion):
+    client = MongoClient(uri)
+    client.server_info()
+    print(f"✅ Conectado a {descripcion}")
+    return client
+
+
+def analizar_colecciones(source_db, colecciones):
+    print("\n" + "=" * 70)
+    print("📊 ANÁLISIS DE DATOS A MIGRAR")
+    print("=" * 70)
+
+    for coleccion in colecciones:
+        count = source_db[coleccion].estimated_document_count()
+        print(f"\n📁 Colección: {coleccion}")
+        print(f"   Documentos: ~{count}")
+
+        if count > 0:
+            ejemplo = source_db[coleccion].find_one()
+            print(f"   Tamaño ejemplo: ~{len(str(ejemplo))} bytes")
+
+    print("\n" + "=" * 70)
+
+
+def insertar_lote(coleccion, lote):
+    try:
+        result = coleccion.insert_many(lote, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as e:
+        return e.details.get("nInserted", 0), len(e.details.get("writeErrors", []))
+
+
+def leer_lotes(source_col, filtro, tamano_lote, cola, escritores, estado):
+    try:
+        lote = []
+        cursor = source_col.with_options(codec_options=RAW_BSON).find(
+            filtro, batch_size=tamano_lote
+        )
+        for documento in cursor:
+            lote.append(documento)
+            if len(lote) >= tamano_lote:
+                cola.put(lote)
+                lote = []
+        if lote:
+            cola.put(lote)
+    except Exception as e:
+        estado["error"] = e
+    finally:
+        for _ in range(escritores):
+            cola.put(FIN)
+
+
+def escribir_lotes(target_col, cola, estado, candado):
+    while True:
+        lote = cola.get()
+        if lote is FIN:
+            return
+
+        try:
+            insertados, errores = insertar_lote(target_col, lote)
+        except Exception as e:
+            insertados, errores = 0, len(lote)
+            estado["error"] = e
+
+        with candado:
+            estado["copiados"] += insertados
+            estado["errores"] += errores
+            estado["bytes"] += sum(len(documento.raw) for documento in lote)
+
+
+def copiar_coleccion(
+    source_col,
+    target_col,
+    filtro=None,
+    tamano_lote=1000,
+    tamano_cola=8,
+    escritores=2,
+    total=None,
+    intervalo_progreso=2.0,
+):
+    cola = queue.Queue(maxsize=tamano_cola)
+    candado = threading.Lock()
+    estado = {"copiados": 0, "errores": 0, "bytes": 0, "error": None}
+
+    lector = threading.Thread(
+        target=leer_lotes,
+        args=(source_col, filtro or {}, tamano_lote, cola, escritores, estado),
+        daemon=True,
+    )
+    hilos = [
+        threading.Thread(
+            target=escribir_lotes,
+            args=(target_col, cola, estado, candado),
+            daemon=True,
+        )
+        for _ in range(escritores)
+    ]
+
+    inicio = time.perf_counter()
+    lector.start()
+    for hilo in hilos:
+        hilo.start()
+
+    while True:
+        vivos = [hilo for hilo in hilos if hilo.is_alive()]
+        if not vivos:
+            break
+
+        vivos[0].join(timeout=intervalo_progreso)
+        if intervalo_progreso:
+            imprimir_progreso(estado, total, inicio)
+
+    lector.join()
+    estado["segundos"] = time.perf_counter() - inicio
+    return estado
+
+
+def imprimir_progreso(estado, total, inicio):
+    transcurrido = time.perf_counter() - inicio
+    if transcurrido <= 0:
+        return
+
+    tasa = estado["copiados"] / transcurrido
+    mb_s = estado["bytes"] / transcurrido / 1024 / 1024
+    progreso = f"{estado['copiados']}/{total}" if total else f"{estado['copiados']}"
+    print(f"   ⏳ {progreso} documentos ({tasa:,.0f} docs/s, {mb_s:.1f} MB/s)")
+
+
+def modelo_indice(index):
+    # Todo lo que no es la clave ni metadatos del servidor es una opción del
+    # índice (unique, sparse, partialFilterExpression, collation, TTL...)
+    opciones = {
+        campo: valor for campo, valor in index.items() if campo not in CAMPOS_NO_OPCION
+    }
+    return IndexModel(list(index["key"].items()), **opciones)
+
+
+def describir_opciones(modelo):
+    opciones = [
+        campo
+        for campo in modelo.document
+        if campo != "name" and campo not in CAMPOS_NO_OPCION
+    ]
+    return f" ({', '.join(opciones)})" if opciones else ""
+
+
+def quitar_indices_secundarios(target_col):
+    # La carga se hace solo con el índice de _id; el resto se construye al final
+    nombres = [i["name"] for i in target_col.list_indexes() if i["name"] != "_id_"]
+    if nombres:
+        target_col.drop_indexes()
+        print(f"   🗑️  {len(nombres)} índices secundarios eliminados en destino")
+
+
+def crear_indices_uno_a_uno(target_col, modelos):
+    creados = 0
+    for modelo in modelos:
+        nombre = modelo.document["name"]
+        inicio = time.perf_counter()
+        try:
+            target_col.create_indexes([modelo])
+            creados += 1
+            print(
+                f"   ✅ {nombre}{describir_opciones(modelo)}: "
+                f"{time.perf_counter() - inicio:.1f}s"
+            )
+        except OperationFailure as e:
+            print(f"   ⚠️  Error creando índice {nombre}: {e}")
+    return creados
+
+
+def migrar_indices(source_col, target_col):
+    print(f"   📊 Migrando índices...")
+
+    modelos = [
+        modelo_indice(index)
+        for index in source_col.list_indexes()
+        if index["name"] != "_id_"
+    ]
+    if not modelos:
+        print(f"   ✅ Sin índices secundarios")
+        return True
+
+    # Un solo createIndexes construye todos los índices en un único recorrido
+    # de la colección, así que comparten el tiempo de construcción
+    inicio = time.perf_counter()
+    try:
+        target_col.create_indexes(modelos)
+    except OperationFailure as e:
+        print(f"   ⚠️  Error en la construcción conjunta: {e}")
+        print(f"   🔁 Reintentando índice por índice...")
+        creados = crear_indices_uno_a_uno(target_col, modelos)
+        print(
+            f"   {'✅' if creados == len(modelos) else '⚠️ '} "
+            f"{creados}/{len(modelos)} índices migrados"
+        )
+        return creados == len(modelos)
+
+    # El tiempo es del comando completo: no hay un tiempo propio por índice
+    transcurrido = time.perf_counter() - inicio
+    for modelo in modelos:
+        print(f"   ✅ {modelo.document['name']}{describir_opciones(modelo)}")
+    print(
+        f"   ✅ {len(modelos)} índices migrados en {transcurrido:.1f}s "
+        "(construidos juntos)"
+    )
+    return True
+
+
+def calcular_rangos(coleccion, particiones, muestras_por_particion=100):
+    if particiones <= 1:
+        return [(None, None)]
+
+    muestra = sorted(
+        documento["_id"]
+        for documento in coleccion.aggregate(
+            [
+                {"$sample": {"size": particiones * muestras_por_particion}},
+                {"$project": {"_id": 1}},
+            ]
+        )
+    )
+    if not muestra:
+        return [(None, None)]
+
+    puntos = sorted(
+        {muestra[len(muestra) * i // particiones] for i in range(1, particiones)}
+    )
+    limites = [None] + puntos + [None]
+
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def filtro_rango(desde, hasta):
+    rango_id = {}
+    if desde is not None:
+        rango_id["$gte"] = desde
+    if hasta is not None:
+        rango_id["$lt"] = hasta
+    return {"_id": rango_id} if rango_id else {}
+
+
+def describir_particion(particion):
+    desde = particion["desde"] if particion["desde"] is not None else "-∞"
+    hasta = particion["hasta"] if particion["hasta"] is not None else "+∞"
+    return f"[{desde}, {hasta})"
+
+
+def cargar_checkpoint(ruta, db_name, reiniciar=False):
+    if not reiniciar and os.path.exists(ruta):
+        with open(ruta, encoding="utf-8") as f:
+            checkpoint = json_util.loads(f.read())
+        if checkpoint.get("db") == db_name:
+            return checkpoint
+        print(f"⚠️  El checkpoint {ruta} es de otra base de datos, se ignora")
+
+    return {"db": db_name, "colecciones": {}}
+
+
+def guardar_checkpoint(ruta, checkpoint):
+    with _candado_checkpoint:
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(json_util.dumps(checkpoint, indent=2))
+        os.replace(temporal, ruta)
+
+
+def copiar_particion(source_col, target_col, particion, args):
+    filtro = filtro_rango(particion["desde"], particion["hasta"])
+
+    # Una partición a medias se limpia antes de recopiarla completa
+    target_col.delete_many(filtro)
+
+    return copiar_coleccion(
+        source_col,
+        target_col,
+        filtro=filtro,
+        tamano_lote=args.lote,
+        tamano_cola=args.cola,
+        escritores=args.escritores,
+        intervalo_progreso=None,
+    )
+
+
+def preparar_particiones(source_db, target_db, coleccion, args, checkpoint):
+    info = checkpoint["colecciones"].get(coleccion)
+
+    if info is not None:
+        completas = sum(p["completa"] for p in info["particiones"])
+        print(
+            f"   ♻️  Reanudando desde checkpoint: {completas}/"
+            f"{len(info['particiones'])} particiones ya copiadas"
+        )
+        return info
+
+    rangos = calcular_rangos(source_db[coleccion], args.particiones)
 
-print("=" * 70)
-print("🚀 MIGRACIÓN DE DATOS: Docker Local → MongoDB Atlas")
-print("=" * 70)
-
-print("\n⚠️  IMPORTANTE:")
-print("   1. Reemplaza <PASSWORD> en TARGET_URI con tu contraseña de Atlas")
-print("   2. Reemplaza 'capta-tickets-prod.xxxxx' con tu cluster de Atlas")
-print("   3. Asegúrate de tener el cluster Atlas creado y configurado")
-
-continuar = input("\n¿Continuar con la migración? (s/n): ")
-if continuar.lower() != 's':
-    print("❌ Migración cancelada")
-    exit()
-
-try:
-    print("\n📡 Conectando a MongoDB Local (Docker)...")
-    source_client = MongoClient(SOURCE_URI)
-    source_db = source_client['capta_tickets']
-    
-    source_client.server_info()
-    print("✅ Conectado a MongoDB Local")
-    
-except Exception as e:
-    print(f"❌ Error conectando a MongoDB Local: {e}")
-    exit()
-
-try:
-    print("\n☁️  Conectando a MongoDB Atlas...")
-    target_client = MongoClient(TARGET_URI)
-    target_db = target_client['capta_tickets']
-    
-    target_client.server_info()
-    print("✅ Conectado a MongoDB Atlas")
-    
-except Exception as e:
-    print(f"❌ Error conectando a MongoDB Atlas: {e}")
-    print("\n💡 Verifica:")
-    print("   - El connection string es correcto")
-    print("   - La contraseña está reemplazada")
-    print("   - La IP 0.0.0.0/0 está en la whitelist")
-    exit()
-
-print("\n" + "=" * 70)
-print("📊 ANÁLISIS DE DATOS A MIGRAR")
-print("=" * 70)
-
-colecciones = ['tickets', 'classifiers']
-
-for coleccion in colecciones:
-    count = source_db[coleccion].count_documents({})
-    print(f"\n📁 Colección: {coleccion}")
-    print(f"   Documentos: {count}")
-    
-    if count > 0:
-        ejemplo = source_db[coleccion].find_one()
-        print(f"   Tamaño ejemplo: ~{len(str(ejemplo))} bytes")
-
-print("\n" + "=" * 70)
-
-confirmar = input("\n¿Proceder con la migración? (s/n): ")
-if confirmar.lower() != 's':
-    print("❌ Migración cancelada")
-    exit()
-
-print("\n" + "=" * 70)
-print("🔄 INICIANDO MIGRACIÓN")
-print("=" * 70)
-
-for coleccion in colecciones:
-    print(f"\n📦 Migrando colección: {coleccion}")
-    
-    source_count = source_db[coleccion].count_documents({})
-    
-    if source_count == 0:
-        print(f"   ⚠️  Colección vacía, saltando...")
-        continue
-    
     target_db[coleccion].drop()
     print(f"   🗑️  Colección destino limpiada")
-    
-    documentos = list(source_db[coleccion].find({}))
-    
-    if documentos:
-        result = target_db[coleccion].insert_many(documentos)
-        print(f"   ✅ {len(result.inserted_ids)} documentos migrados")
-    
-    indices_source = source_db[coleccion].list_indexes()
-    
-    print(f"   📊 Migrando índices...")
-    indices_migrados = 0
-    
-    for index in indices_source:
-        if index['name'] != '_id_':
+
+    info = {
+        "particiones": [
+            {"desde": desde, "hasta": hasta, "completa": False, "copiados": 0}
+            for desde, hasta in rangos
+        ],
+        "indices": False,
+    }
+    checkpoint["colecciones"][coleccion] = info
+    guardar_checkpoint(args.checkpoint, checkpoint)
+
+    return info
+
+
+def migrar_coleccion(source_db, target_db, coleccion, args, checkpoint):
+    print(f"\n📦 Migrando colección: {coleccion}")
+
+    source_count = source_db[coleccion].estimated_document_count()
+
+    if source_count == 0 and coleccion not in checkpoint["colecciones"]:
+        print(f"   ⚠️  Colección vacía, saltando...")
+        return True
+
+    info = preparar_particiones(source_db, target_db, coleccion, args, checkpoint)
+    particiones = info["particiones"]
+    pendientes = [p for p in particiones if not p["completa"]]
+
+    if pendientes and not info["indices"]:
+        quitar_indices_secundarios(target_db[coleccion])
+    inicio = time.perf_counter()
+    copiados = sum(p["copiados"] for p in particiones if p["completa"])
+    correcto = True
+
+    print(
+        f"   🔀 {len(pendientes)} particiones pendientes, "
+        f"{args.paralelas} en paralelo"
+    )
+
+    with ThreadPoolExecutor(max_workers=args.paralelas) as executor:
+        futuros = {
+            executor.submit(
+                copiar_particion,
+                source_db[coleccion],
+                target_db[coleccion],
+                particion,
+                args,
+            ): particion
+            for particion in pendientes
+        }
+
+        for futuro in as_completed(futuros):
+            particion = futuros[futuro]
+
             try:
-                keys = list(index['key'].items())
-                opciones = {}
-                
-                if 'name' in index:
-                    opciones['name'] = index['name']
-                
-                target_db[coleccion].create_index(keys, **opciones)
-                indices_migrados += 1
-                
+                estado = futuro.result()
             except Exception as e:
-                print(f"   ⚠️  Error creando índice {index['name']}: {e}")
-    
-    print(f"   ✅ {indices_migrados} índices migrados")
-
-print("\n" + "=" * 70)
-print("✅ VERIFICACIÓN POST-MIGRACIÓN")
-print("=" * 70)
-
-todo_correcto = True
-
-for coleccion in colecciones:
-    source_count = source_db[coleccion].count_documents({})
-    target_count = target_db[coleccion].count_documents({})
-    
-    print(f"\n📁 {coleccion}:")
-    print(f"   Origen: {source_count} documentos")
-    print(f"   Destino: {target_count} documentos")
-    
-    if source_count == target_count:
-        print(f"   ✅ Coinciden")
-    else:
-        print(f"   ❌ NO COINCIDEN")
+                estado = {"copiados": 0, "errores": 0, "error": e}
+
+            if estado["errores"] or estado["error"]:
+                correcto = False
+                print(
+                    f"   ❌ Partición {describir_particion(particion)} incompleta: "
+                    f"{estado['error'] or str(estado['errores']) + ' errores'}"
+                )
+                continue
+
+            particion["completa"] = True
+            particion["copiados"] = estado["copiados"]
+            guardar_checkpoint(args.checkpoint, checkpoint)
+
+            copiados += estado["copiados"]
+            transcurrido = time.perf_counter() - inicio
+            completas = sum(p["completa"] for p in particiones)
+            print(
+                f"   ✅ Partición {completas}/{len(particiones)} "
+                f"{describir_particion(particion)}: {estado['copiados']} documentos "
+                f"(total {copiados}/{source_count}, "
+                f"{copiados / max(transcurrido, 1e-9):,.0f} docs/s)"
+            )
+
+    if not correcto:
+        print("   💡 Vuelve a ejecutar el script para copiar solo lo pendiente")
+        return False
+
+    if not info["indices"]:
+        if not migrar_indices(source_db[coleccion], target_db[coleccion]):
+            return False
+        info["indices"] = True
+        guardar_checkpoint(args.checkpoint, checkpoint)
+
+    return True
+
+
+def verificar_conteos(source_db, target_db, colecciones):
+    print("\n" + "=" * 70)
+    print("✅ VERIFICACIÓN POST-MIGRACIÓN")
+    print("=" * 70)
+
+    todo_correcto = True
+
+    for coleccion in colecciones:
+        source_count = source_db[coleccion].count_documents({})
+        target_count = target_db[coleccion].count_documents({})
+
+        print(f"\n📁 {coleccion}:")
+        print(f"   Origen: {source_count} documentos")
+        print(f"   Destino: {target_count} documentos")
+
+        if source_count == target_count:
+            print(f"   ✅ Coinciden")
+        else:
+            print(f"   ❌ NO COINCIDEN")
+            todo_correcto = False
+
+    return todo_correcto
+
+
+def abrir_cambios(source_db, colecciones, token=None, tamano_lote=1000, espera=1.0):
+    return source_db.watch(
+        [{"$match": {"ns.coll": {"$in": colecciones}}}],
+        resume_after=token,
+        full_document="updateLookup",
+        max_await_time_ms=int(espera * 1000),
+        batch_size=tamano_lote,
+    )
+
+
+def registrar_token(source_db, colecciones, args, checkpoint):
+    # El token se toma antes de copiar nada: todo cambio posterior al inicio
+    # de la copia queda en el change stream y se vuelve a aplicar después
+    if checkpoint.get("token") is not None:
+        print("♻️  Se conserva el resume token del checkpoint")
+        return
+
+    if checkpoint["colecciones"]:
+        print("⚠️  El checkpoint no tiene resume token: los cambios hechos en")
+        print("   particiones ya copiadas antes de ahora no se replicarán")
+        print("   (usa --reiniciar para una copia consistente)")
+
+    with abrir_cambios(source_db, colecciones, espera=0.1) as stream:
+        token = stream.resume_token
+        if token is None:
+            stream.try_next()
+            token = stream.resume_token
+
+    checkpoint["token"] = token
+    guardar_checkpoint(args.checkpoint, checkpoint)
+    print("📍 Resume token registrado antes de la copia")
+
+
+def operacion_replica(cambio):
+    filtro = {"_id": cambio["documentKey"]["_id"]}
+
+    if cambio["operationType"] == "delete":
+        return DeleteOne(filtro)
+
+    # Con updateLookup el documento puede ser más nuevo que el evento; si ya
+    # no existe, su delete llega más adelante en el mismo stream
+    documento = cambio.get("fullDocument")
+    if documento is None:
+        return None
+    return ReplaceOne(filtro, documento, upsert=True)
+
+
+def aplicar_cambios(target_db, operaciones):
+    aplicados = 0
+    for coleccion, ops in operaciones.items():
+        # ordered=True respeta el orden de los eventos sobre un mismo _id
+        target_db[coleccion].bulk_write(ops, ordered=True)
+        aplicados += len(ops)
+    operaciones.clear()
+    return aplicados
+
+
+def retraso_evento(cambio):
+    hora = cambio["clusterTime"].as_datetime()
+    return max((datetime.now(timezone.utc) - hora).total_seconds(), 0.0)
+
+
+def sincronizar_destino(source_db, target_db, colecciones, args, checkpoint):
+    print("\n" + "=" * 70)
+    print("🔁 SINCRONIZACIÓN INCREMENTAL")
+    print("=" * 70)
+
+    operaciones = defaultdict(list)
+    pendientes = 0
+    aplicados = 0
+    retraso = 0.0
+    ultimo_vaciado = time.monotonic()
+    detener = False
+
+    with abrir_cambios(
+        source_db, colecciones, checkpoint["token"], args.lote, args.espera
+    ) as stream:
+        while stream.alive:
+            try:
+                cambio = stream.try_next()
+            except KeyboardInterrupt:
+                cambio, detener = None, True
+
+            if cambio is not None:
+                if cambio["operationType"] in EVENTOS_INVALIDANTES:
+                    print(
+                        f"   ❌ Evento '{cambio['operationType']}' en "
+                        f"{cambio.get('ns')}: vuelve a migrar con --reiniciar"
+                    )
+                    return False
+
+                operacion = operacion_replica(cambio)
+                if operacion is not None:
+                    operaciones[cambio["ns"]["coll"]].append(operacion)
+                    pendientes += 1
+                retraso = retraso_evento(cambio)
+            else:
+                retraso = 0.0
+
+            vencido = time.monotonic() - ultimo_vaciado >= args.espera
+            if pendientes < args.lote and not vencido and cambio is not None:
+                continue
+
+            if pendientes:
+                aplicados += aplicar_cambios(target_db, operaciones)
+                pendientes = 0
+
+            # El token solo avanza cuando todo lo anterior ya fue aplicado
+            if stream.resume_token != checkpoint["token"]:
+                checkpoint["token"] = stream.resume_token
+                guardar_checkpoint(args.checkpoint, checkpoint)
+            ultimo_vaciado = time.monotonic()
+
+            print(f"   🔄 {aplicados} cambios aplicados, retraso {retraso:.1f}s")
+
+            if detener:
+                print("   ⏹️  Sincronización detenida")
+                return True
+
+            if not args.continuo and retraso <= args.retraso_maximo:
+                print("   ✅ Destino al día con el origen")
+                return True
+
+    return True
+
+
+def cursor_ordenado(coleccion, filtro, tamano_lote):
+    return coleccion.with_options(codec_options=RAW_BSON).find(
+        filtro, sort=[("_id", 1)], batch_size=tamano_lote
+    )
+
+
+def hash_particion(coleccion, filtro, tamano_lote):
+    # Se copian como BSON crudo, así que origen y destino deben tener
+    # exactamente los mismos bytes en el mismo orden de _id
+    resumen = hashlib.sha256()
+    documentos = 0
+
+    for documento in cursor_ordenado(coleccion, filtro, tamano_lote):
+        resumen.update(documento.raw)
+        documentos += 1
+
+    return documentos, resumen.hexdigest()
+
+
+def huellas_documentos(coleccion, filtro, tamano_lote):
+    return {
+        documento["_id"]: hashlib.sha256(documento.raw).digest()
+        for documento in cursor_ordenado(coleccion, filtro, tamano_lote)
+    }
+
+
+def comparar_documentos(source_col, target_col, filtro, tamano_lote):
+    origen = huellas_documentos(source_col, filtro, tamano_lote)
+    destino = huellas_documentos(target_col, filtro, tamano_lote)
+
+    return {
+        "faltantes": [_id for _id in origen if _id not in destino],
+        "sobrantes": [_id for _id in destino if _id not in origen],
+        "distintos": [
+            _id
+            for _id, huella in origen.items()
+            if _id in destino and destino[_id] != huella
+        ],
+    }
+
+
+def imprimir_diferencias(particion, diferencias, mostrar):
+    print(f"   ❌ Partición {describir_particion(particion)}:")
+    for tipo, ids in diferencias.items():
+        if ids:
+            ejemplos = ", ".join(str(_id) for _id in ids[:mostrar])
+            resto = f" (+{len(ids) - mostrar})" if len(ids) > mostrar else ""
+            print(f"      {tipo}: {len(ids)} → {ejemplos}{resto}")
+
+
+def verificar_hashes(source_db, target_db, colecciones, args):
+    print("\n" + "=" * 70)
+    print("✅ VERIFICACIÓN POST-MIGRACIÓN (hash por partición)")
+    print("=" * 70)
+
+    todo_correcto = True
+
+    for coleccion in colecciones:
+        source_col = source_db[coleccion]
+        target_col = target_db[coleccion]
+        inicio = time.perf_counter()
+
+        particiones = [
+            {"desde": desde, "hasta": hasta}
+            for desde, hasta in calcular_rangos(source_col, args.particiones)
+        ]
+
+        print(f"\n📁 {coleccion}: {len(particiones)} particiones")
+
+        with ThreadPoolExecutor(max_workers=args.paralelas * 2) as executor:
+            futuros = [
+                (
+                    particion,
+                    executor.submit(hash_particion, source_col, filtro, args.lote),
+                    executor.submit(hash_particion, target_col, filtro, args.lote),
+                )
+                for particion in particiones
+                for filtro in [filtro_rango(particion["desde"], particion["hasta"])]
+            ]
+            resultados = [
+                (particion, origen.result(), destino.result())
+                for particion, origen, destino in futuros
+            ]
+
+        documentos = sum(origen[0] for _, origen, _ in resultados)
+        distintas = [
+            particion for particion, origen, destino in resultados if origen != destino
+        ]
+        transcurrido = time.perf_counter() - inicio
+
+        print(
+            f"   {documentos} documentos en origen, "
+            f"{len(particiones) - len(distintas)}/{len(particiones)} particiones "
+            f"idénticas ({transcurrido:.1f}s)"
+        )
+
+        if not distintas:
+            print(f"   ✅ Coinciden")
+            continue
+
         todo_correcto = False
 
-print("\n" + "=" * 70)
+        # Solo se baja al detalle por documento en las particiones que difieren
+        for particion in distintas:
+            diferencias = comparar_documentos(
+                source_col,
+                target_col,
+                filtro_rango(particion["desde"], particion["hasta"]),
+                args.lote,
+            )
+            imprimir_diferencias(particion, diferencias, args.mostrar)
+
+    return todo_correcto
+
+
+def verificar(source_db, target_db, args):
+    if args.verificacion == "conteos":
+        return verificar_conteos(source_db, target_db, args.colecciones)
+    return verificar_hashes(source_db, target_db, args.colecciones, args)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Migra capta_tickets desde MongoDB local (Docker) a MongoDB Atlas"
+    )
+    parser.add_argument("--source-uri", default=SOURCE_URI, help="URI de origen")
+    parser.add_argument("--target-uri", default=TARGET_URI, help="URI de destino")
+    parser.add_argument(
+        "--db", default=DB_NAME, help=f"Base de datos (default: {DB_NAME})"
+    )
+    parser.add_argument(
+        "--colecciones",
+        nargs="+",
+        default=COLECCIONES,
+        help=f"Colecciones a migrar (default: {' '.join(COLECCIONES)})",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=1000,
+        help="Documentos por lectura (batch_size) y por insert_many (default: 1000)",
+    )
+    parser.add_argument(
+        "--cola",
+        type=int,
+        default=8,
+        help="Lotes máximos en memoria entre lector y escritores (default: 8)",
+    )
+    parser.add_argument(
+        "--escritores",
+        type=int,
+        default=2,
+        help="Hilos que insertan en destino en paralelo (default: 2)",
+    )
+    parser.add_argument(
+        "--particiones",
+        type=int,
+        default=16,
+        help="Rangos de _id en que se divide cada colección (default: 16)",
+    )
+    parser.add_argument(
+        "--paralelas",
+        type=int,
+        default=4,
+        help="Particiones copiadas al mismo tiempo (default: 4)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Archivo de checkpoint (default: migracion_<db>.checkpoint.json)",
+    )
+    parser.add_argument(
+        "--reiniciar",
+        action="store_true",
+        help="Ignorar el checkpoint existente y migrar desde cero",
+    )
+    parser.add_argument(
+        "--sincronizar",
+        action="store_true",
+        help="Registrar un resume token antes de copiar y aplicar después los "
+        "cambios ocurridos durante la copia (requiere replica set en origen)",
+    )
+    parser.add_argument(
+        "--continuo",
+        action="store_true",
+        help="Con --sincronizar, seguir aplicando cambios hasta Ctrl+C",
+    )
+    parser.add_argument(
+        "--retraso-maximo",
+        type=float,
+        default=1.0,
+        help="Segundos de retraso con los que se da el destino por al día (default: 1)",
+    )
+    parser.add_argument(
+        "--espera",
+        type=float,
+        default=1.0,
+        help="Segundos máximos antes de aplicar un lote incompleto de cambios "
+        "(default: 1)",
+    )
+    parser.add_argument(
+        "--verificacion",
+        choices=["hash", "conteos"],
+        default="hash",
+        help="Verificación final: hash por partición o solo conteos (default: hash)",
+    )
+    parser.add_argument(
+        "--solo-verificar",
+        action="store_true",
+        help="No copiar nada, solo verificar origen contra destino",
+    )
+    parser.add_argument(
+        "--mostrar",
+        type=int,
+        default=5,
+        help="_id de ejemplo mostrados por tipo de diferencia (default: 5)",
+    )
+    parser.add_argument(
+        "-y",
+        "--si",
+        action="store_true",
+        help="No pedir confirmación antes de migrar",
+    )
+    args = parser.parse_args()
+    args.sincronizar = args.sincronizar or args.continuo
+    args.checkpoint = args.checkpoint or f"migracion_{args.db}.checkpoint.json"
+    return args
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("🚀 MIGRACIÓN DE DATOS: Docker Local → MongoDB Atlas")
+    print("=" * 70)
+
+    print("\n⚠️  IMPORTANTE:")
+    print("   1. Indica --target-uri con la contraseña de tu cluster Atlas")
+    print("   2. Asegúrate de tener el cluster Atlas creado y configurado")
+    print("   3. La migración reemplaza las colecciones en el destino")
+    print("   4. Si se interrumpe, vuelve a ejecutarla: solo copia lo pendiente")
+
+    if not args.solo_verificar and not confirmar(
+        "\n¿Continuar con la migración? (s/n): ", args.si
+    ):
+        print("❌ Migración cancelada")
+        sys.exit()
+
+    try:
+        print("\n📡 Conectando a MongoDB Local (Docker)...")
+        source_client = conectar(args.source_uri, "MongoDB Local")
+        source_db = source_client[args.db]
+    except Exception as e:
+        print(f"❌ Error conectando a MongoDB Local: {e}")
+        sys.exit(1)
+
+    try:
+        print("\n☁️  Conectando a MongoDB Atlas...")
+        target_client = conectar(args.target_uri, "MongoDB Atlas")
+        target_db = target_client[args.db]
+    except Exception as e:
+        print(f"❌ Error conectando a MongoDB Atlas: {e}")
+        print("\n💡 Verifica:")
+        print("   - El connection string es correcto")
+        print("   - La contraseña está reemplazada")
+        print("   - La IP 0.0.0.0/0 está en la whitelist")
+        sys.exit(1)
+
+    if args.solo_verificar:
+        todo_correcto = verificar(source_db, target_db, args)
+        print("\n" + "=" * 70)
+        sys.exit(0 if todo_correcto else 1)
+
+    analizar_colecciones(source_db, args.colecciones)
+
+    if not confirmar("\n¿Proceder con la migración? (s/n): ", args.si):
+        print("❌ Migración cancelada")
+        sys.exit()
+
+    print("\n" + "=" * 70)
+    print("🔄 INICIANDO MIGRACIÓN")
+    print("=" * 70)
+
+    checkpoint = cargar_checkpoint(args.checkpoint, args.db, args.reiniciar)
+
+    if args.sincronizar:
+        try:
+            registrar_token(source_db, args.colecciones, args, checkpoint)
+        except OperationFailure as e:
+            print(f"❌ No se pudo abrir el change stream en origen: {e}")
+            print("   --sincronizar requiere que el origen sea un replica set")
+            sys.exit(1)
+
+    copia_correcta = True
+    for coleccion in args.colecciones:
+        copia_correcta &= migrar_coleccion(
+            source_db, target_db, coleccion, args, checkpoint
+        )
+
+    if copia_correcta and args.sincronizar:
+        try:
+            copia_correcta = sincronizar_destino(
+                source_db, target_db, args.colecciones, args, checkpoint
+            )
+        except OperationFailure as e:
+            copia_correcta = False
+            if e.code == CHANGE_STREAM_HISTORY_LOST:
+                print("   ❌ El resume token ya no está en el oplog del origen")
+                print("   Vuelve a migrar con --reiniciar o amplía el oplog")
+            else:
+                print(f"   ❌ Error en el change stream: {e}")
+        except BulkWriteError as e:
+            copia_correcta = False
+            print(f"   ❌ Error aplicando cambios en destino: {e.details}")
+            print("   Vuelve a ejecutar el script para reanudar desde el token")
+
+    todo_correcto = verificar(source_db, target_db, args)
+    todo_correcto &= copia_correcta
+
+    # Sin --continuo se conserva el checkpoint (y su token) para poder
+    # relanzar la sincronización en el momento del corte
+    if args.sincronizar and not args.continuo:
+        if copia_correcta:
+            print("\n💡 Para el corte: ejecuta de nuevo con --continuo, detén las")
+            print("   escrituras en origen y pulsa Ctrl+C cuando el retraso sea 0s")
+    elif copia_correcta and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    print("\n" + "=" * 70)
+
+    if todo_correcto:
+        print("✅ MIGRACIÓN COMPLETADA EXITOSAMENTE")
+        print("\n💡 Próximos pasos:")
+        print("   1. Actualiza el MONGO_URI en app.py con el de Atlas")
+        print("   2. Despliega en Vercel")
+        print("   3. Configura el secret MONGO_URI en Vercel")
+    else:
+        print("⚠️  MIGRACIÓN COMPLETADA CON ADVERTENCIAS")
+        print("   Revisa las colecciones o particiones que no coinciden")
+
+    print("\n📝 Connection String para Vercel:")
+    print(f"   {args.target_uri}")
 
-if todo_correcto:
-    print("✅ MIGRACIÓN COMPLETADA EXITOSAMENTE")
-    print("\n💡 Próximos pasos:")
-    print("   1. Actualiza el MONGO_URI en app.py con el de Atlas")
-    print("   2. Despliega en Vercel")
-    print("   3. Configura el secret MONGO_URI en Vercel")
-else:
-    print("⚠️  MIGRACIÓN COMPLETADA CON ADVERTENCIAS")
-    print("   Verifica los conteos que no coinciden")
+    print("\n" + "=" * 70)
 
-print("\n📝 Connection String para Vercel:")
-print(f"   {TARGET_URI}")
 
-print("\n" + "=" * 70)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
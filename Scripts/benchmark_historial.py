@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import argparse
+import random
+import timeit
+
+from desnormalizacion import (
+    calcular_cambios_estado,
+    calcular_comentarios,
+    calcular_reaperturas,
+    obtener_fecha_cierre,
+    obtener_ultima_modificacion,
+    obtener_ultimo_cambio_estado,
+    reducir_historial,
+)
+
+TRANSICIONES = {
+    "open": ["in_progress", "closed"],
+    "in_progress": ["closed", "open"],
+    "closed": ["open", "in_progress"],
+}
+
+
+def generar_historial(longitud, rng):
+    fecha = datetime(2025, 1, 1)
+    estado = "open"
+    history = [{"action": "created", "timestamp": fecha, "userId": "user_001"}]
+
+    while len(history) < longitud:
+        fecha += timedelta(hours=rng.randint(1, 48))
+        tipo = rng.choice(["state_change", "comment", "assignment"])
+
+        if tipo == "state_change":
+            nuevo_estado = rng.choice(TRANSICIONES[estado])
+            history.append(
+                {
+                    "action": "state_change",
+                    "timestamp": fecha,
+                    "from": estado,
+                    "to": nuevo_estado,
+                }
+            )
+            estado = nuevo_estado
+        else:
+            history.append({"action": tipo, "timestamp": fecha})
+
+    return history, estado
+
+
+def calcular_por_separado(history, current_state):
+    return {
+        "reopenCount": calcular_reaperturas(history),
+        "stateChangeCount": calcular_cambios_estado(history),
+        "commentCount": calcular_comentarios(history),
+        "closedAt": obtener_fecha_cierre(history, current_state),
+        "lastStateChangeAt": obtener_ultimo_cambio_estado(history),
+        "lastModifiedAt": obtener_ultima_modificacion(history),
+    }
+
+
+def medir(funcion, tickets, repeticiones):
+    def ejecutar():
+        for history, estado in tickets:
+            funcion(history, estado)
+
+    return min(timeit.repeat(ejecutar, number=1, repeat=repeticiones))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara el reductor de historial de una pasada con las seis funciones"
+    )
+    parser.add_argument(
+        "--longitudes",
+        type=int,
+        nargs="+",
+        default=[5, 50, 200, 500],
+        help="Acciones por ticket a evaluar (default: 5 50 200 500)",
+    )
+    parser.add_argument(
+        "--tickets",
+        type=int,
+        default=2000,
+        help="Tickets por longitud (default: 2000)",
+    )
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK: REDUCCIÓN DEL HISTORIAL")
+    print("=" * 60)
+    print(f"\n{'Acciones':>9} {'6 pasadas':>12} {'1 pasada':>12} {'Speedup':>9}")
+
+    for longitud in args.longitudes:
+        tickets = [generar_historial(longitud, rng) for _ in range(args.tickets)]
+
+        for history, estado in tickets:
+            assert reducir_historial(history, estado) == calcular_por_separado(
+                history, estado
+            )
+
+        separado = medir(calcular_por_separado, tickets, args.repeticiones)
+        reducido = medir(reducir_historial, tickets, args.repeticiones)
+
+        print(
+            f"{longitud:>9} {separado * 1000:>10.1f}ms {reducido * 1000:>10.1f}ms "
+            f"{separado / reducido:>8.2f}x"
+        )
+
+    print(f"\n(tiempos para {args.tickets} tickets, mejor de {args.repeticiones})")
+
+
+if __name__ == "__main__":
+    main()
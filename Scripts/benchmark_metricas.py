@@ -0,0 +1,152 @@
+from datetime import timedelta
+from pymongo import MongoClient
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "streamlit"))
+
+from capta_tickets import MONGO_URI
+from queries import TicketQueries
+
+
+def metricas_por_separado(queries, start_date, end_date, estado, clasificador):
+    # Implementación anterior: cuatro count_documents y un $group
+    query = queries.build_match_query(start_date, end_date, estado, clasificador)
+    query["createdAt"] = {"$gte": start_date, "$lte": end_date}
+
+    total = queries.db.tickets.count_documents(query)
+
+    if estado != "Todos":
+        abiertos = total if estado == "open" else 0
+        en_progreso = total if estado == "in_progress" else 0
+        cerrados = total if estado == "closed" else 0
+    else:
+        abiertos = queries.db.tickets.count_documents({**query, "currentState": "open"})
+        en_progreso = queries.db.tickets.count_documents(
+            {**query, "currentState": "in_progress"}
+        )
+        cerrados = queries.db.tickets.count_documents(
+            {**query, "currentState": "closed"}
+        )
+
+    pipeline = [
+        {"$match": query},
+        {"$group": {"_id": None, "total": {"$sum": "$reopenCount"}}},
+    ]
+    reaperturas_result = list(queries.db.tickets.aggregate(pipeline))
+    reaperturas = reaperturas_result[0]["total"] if reaperturas_result else 0
+
+    return {
+        "total": total,
+        "abiertos": abiertos,
+        "en_progreso": en_progreso,
+        "cerrados": cerrados,
+        "reaperturas": reaperturas,
+    }
+
+
+def reaperturas_por_separado(queries, estado, clasificador):
+    # Implementación anterior: dos count_documents
+    query = queries.build_match_query(None, None, estado, clasificador)
+    total = queries.db.tickets.count_documents(query)
+    con_reaperturas = queries.db.tickets.count_documents(
+        {**query, "reopenCount": {"$gt": 0}}
+    )
+    return {
+        "con_reaperturas": con_reaperturas,
+        "sin_reaperturas": total - con_reaperturas,
+        "total": total,
+    }
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara get_metrics y get_reopenings_stats en una agregación "
+        "contra las consultas por separado"
+    )
+    parser.add_argument("--uri", default=MONGO_URI, help="URI de MongoDB")
+    parser.add_argument(
+        "--dias",
+        type=int,
+        default=60,
+        help="Días hasta el último ticket usados como período (default: 60)",
+    )
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    db = MongoClient(args.uri)["capta_tickets"]
+    queries = TicketQueries(db)
+
+    ultimo = db.tickets.find_one(sort=[("createdAt", -1)])
+    if ultimo is None:
+        print("❌ No hay tickets: genera datos con 'python Scripts/capta_tickets.py'")
+        sys.exit(1)
+
+    end_date = ultimo["createdAt"]
+    start_date = end_date - timedelta(days=args.dias)
+    nodo = db.classifiers.find_one({"level": 1}, sort=[("_id", 1)])
+    clasificador = nodo["_id"] if nodo else "Todos"
+
+    escenarios = [("Todos", "Todos"), ("Todos", clasificador), ("open", "Todos")]
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK: MÉTRICAS DEL DASHBOARD")
+    print("=" * 70)
+    print(f"\nTickets: ~{db.tickets.estimated_document_count()}")
+    print(f"Período: {start_date:%d/%m/%Y} - {end_date:%d/%m/%Y}")
+    print(
+        f"\n{'Consulta':<22} {'Filtro':<22} {'Separadas':>11} "
+        f"{'Agregación':>11} {'Speedup':>8}"
+    )
+
+    for estado, clasificador_escenario in escenarios:
+        filtro = f"{estado}/{clasificador_escenario}"
+
+        casos = [
+            (
+                "get_metrics",
+                lambda: metricas_por_separado(
+                    queries, start_date, end_date, estado, clasificador_escenario
+                ),
+                lambda: queries.get_metrics(
+                    start_date, end_date, estado, clasificador_escenario
+                ),
+            ),
+            (
+                "get_reopenings_stats",
+                lambda: reaperturas_por_separado(
+                    queries, estado, clasificador_escenario
+                ),
+                lambda: queries.get_reopenings_stats(estado, clasificador_escenario),
+            ),
+        ]
+
+        for nombre, separado, agregado in casos:
+            assert separado() == agregado()
+
+            tiempo_separado = medir(separado, args.repeticiones)
+            tiempo_agregado = medir(agregado, args.repeticiones)
+
+            print(
+                f"{nombre:<22} {filtro:<22} {tiempo_separado * 1000:>9.1f}ms "
+                f"{tiempo_agregado * 1000:>9.1f}ms "
+                f"{tiempo_separado / tiempo_agregado:>7.2f}x"
+            )
+
+    print(f"\n(mediana de {args.repeticiones} ejecuciones)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+from pymongo import MongoClient
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import bson
+import glob
+import gzip
+import multiprocessing
+import os
+import time
+
+from capta_tickets import (
+    EXTENSIONES_SHARD,
+    MONGO_URI,
+    insertar_lote,
+    insertar_lote_tickets,
+    limpiar_tickets,
+)
+from clasificadores import marcar_version_clasificadores
+
+client = MongoClient(MONGO_URI)
+db = client["capta_tickets"]
+
+_db_worker = None
+
+
+def inicializar_worker():
+    global _db_worker
+    _db_worker = MongoClient(MONGO_URI)["capta_tickets"]
+
+
+def buscar_clasificadores(directorio):
+    for extension in EXTENSIONES_SHARD.values():
+        ruta = os.path.join(directorio, f"classifiers.{extension}")
+        if os.path.exists(ruta):
+            return ruta
+    return None
+
+
+def cargar_clasificadores(ruta, tamano_lote=5000):
+    print(f"\nCargando clasificadores desde {os.path.basename(ruta)}...")
+
+    try:
+        db.classifiers.drop()
+        insertados = 0
+        lote = []
+
+        for documento in leer_shard(ruta):
+            lote.append(documento)
+            if len(lote) >= tamano_lote:
+                ok, _ = insertar_lote(db.classifiers, lote)
+                insertados += ok
+                lote = []
+
+        if lote:
+            ok, _ = insertar_lote(db.classifiers, lote)
+            insertados += ok
+
+        marcar_version_clasificadores(db)
+        print(f"  ✅ {insertados} clasificadores cargados")
+        return True
+    except Exception as e:
+        print(f"  ❌ Error al cargar clasificadores: {e}")
+        return False
+
+
+def listar_shards(directorio):
+    shards = []
+    for extension in EXTENSIONES_SHARD.values():
+        shards.extend(glob.glob(os.path.join(directorio, f"tickets_*.{extension}")))
+    return sorted(shards)
+
+
+def leer_shard(ruta):
+    if ruta.endswith(".bson"):
+        # Los documentos se insertan tal cual, sin decodificarlos a dicts
+        opciones = CodecOptions(document_class=RawBSONDocument)
+        with open(ruta, "rb") as f:
+            yield from bson.decode_file_iter(f, codec_options=opciones)
+    else:
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            for linea in f:
+                if linea.strip():
+                    yield json_util.loads(linea)
+
+
+def insertar_documentos(coleccion, lote):
+    if coleccion == "tickets":
+        return insertar_lote_tickets(_db_worker, lote)
+    return insertar_lote(_db_worker[coleccion], lote)
+
+
+def cargar_shard(ruta, coleccion, tamano_lote):
+    insertados = 0
+    errores = 0
+    lote = []
+
+    for documento in leer_shard(ruta):
+        lote.append(documento)
+        if len(lote) >= tamano_lote:
+            ok, fallidos = insertar_documentos(coleccion, lote)
+            insertados += ok
+            errores += fallidos
+            lote = []
+
+    if lote:
+        ok, fallidos = insertar_documentos(coleccion, lote)
+        insertados += ok
+        errores += fallidos
+
+    return insertados, errores
+
+
+def cargar_dataset(
+    directorio, coleccion="tickets", procesos=None, tamano_lote=1000, limpiar=True
+):
+    shards = listar_shards(directorio)
+    if not shards:
+        print(f"  ⚠️  No se encontraron shards en {directorio}")
+        return False
+
+    procesos = procesos or os.cpu_count() or 1
+    print(f"\nCargando {len(shards)} shards con {procesos} procesos...")
+
+    try:
+        if limpiar and coleccion == "tickets":
+            limpiar_tickets(db)
+        elif limpiar:
+            db[coleccion].drop()
+            print(f"  Colección '{coleccion}' limpiada")
+
+        insertados = 0
+        errores = 0
+        inicio = time.perf_counter()
+
+        with ProcessPoolExecutor(
+            max_workers=procesos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=inicializar_worker,
+        ) as executor:
+            futuros = {
+                executor.submit(cargar_shard, ruta, coleccion, tamano_lote): ruta
+                for ruta in shards
+            }
+
+            for futuro in as_completed(futuros):
+                ok, fallidos = futuro.result()
+                insertados += ok
+                errores += fallidos
+
+                transcurrido = time.perf_counter() - inicio
+                tasa = insertados / transcurrido if transcurrido > 0 else 0
+                print(
+                    f"  {os.path.basename(futuros[futuro])}: {ok} documentos "
+                    f"(total {insertados}, {tasa:,.0f} docs/s)"
+                )
+
+        transcurrido = time.perf_counter() - inicio
+        tasa = insertados / transcurrido if transcurrido > 0 else 0
+        print(
+            f"  ✅ {insertados} documentos cargados en {transcurrido:.1f}s "
+            f"({tasa:,.0f} docs/s)"
+        )
+
+        if errores:
+            print(f"  ⚠️  {errores} documentos no se pudieron insertar")
+
+        return errores == 0
+    except Exception as e:
+        print(f"  ❌ Error al cargar el dataset: {e}")
+        return False
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Carga en MongoDB los shards exportados por capta_tickets.py"
+    )
+    parser.add_argument("directorio", help="Directorio con los shards")
+    parser.add_argument(
+        "--coleccion",
+        default="tickets",
+        help="Colección destino (default: tickets)",
+    )
+    parser.add_argument(
+        "--procesos",
+        type=int,
+        default=0,
+        help="Procesos de carga en paralelo (default: todos los núcleos)",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=1000,
+        help="Tamaño de cada lote de insert_many (default: 1000)",
+    )
+    parser.add_argument(
+        "--no-limpiar",
+        action="store_true",
+        help="No eliminar la colección destino antes de cargar",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("📦 CARGA DE DATASET - CAPTA TICKETS")
+    print("=" * 60)
+
+    ruta_clasificadores = buscar_clasificadores(args.directorio)
+    if ruta_clasificadores and args.coleccion == "tickets":
+        cargar_clasificadores(ruta_clasificadores)
+
+    if cargar_dataset(
+        args.directorio,
+        coleccion=args.coleccion,
+        procesos=args.procesos or None,
+        tamano_lote=args.lote,
+        limpiar=not args.no_limpiar,
+    ):
+        print("\n✅ ¡Carga completada exitosamente!")
+    else:
+        print("\n❌ Hubo errores durante la carga")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+# El dashboard recarga su árbol de clasificadores cuando cambia esta versión
+COLECCION_VERSIONES = "metadata"
+ID_VERSION_CLASIFICADORES = "classifiers"
+
+
+def crear_nodo(nodo_id, padre, nivel, es_hoja):
+    ancestros = padre["ancestors"] + [padre["_id"]] if padre else []
+    etiqueta = nodo_id.split("_", 1)[1].replace("_", ".")
+
+    return {
+        "_id": nodo_id,
+        "name": f"Clasificador {etiqueta}",
+        "parentId": padre["_id"] if padre else None,
+        "rootId": ancestros[0] if ancestros else nodo_id,
+        "ancestors": ancestros,
+        "path": "/".join(ancestros + [nodo_id]),
+        "level": nivel,
+        "isLeaf": es_hoja,
+    }
+
+
+def generar_arbol_clasificadores(profundidad=3, ramificacion=5, raices=1):
+    nivel_actual = [
+        crear_nodo(f"cls_{r}", None, 0, profundidad == 0) for r in range(1, raices + 1)
+    ]
+    nodos = list(nivel_actual)
+
+    for nivel in range(1, profundidad + 1):
+        siguiente_nivel = []
+
+        for padre in nivel_actual:
+            for k in range(1, ramificacion + 1):
+                siguiente_nivel.append(
+                    crear_nodo(
+                        f"{padre['_id']}_{k}", padre, nivel, nivel == profundidad
+                    )
+                )
+
+        nodos.extend(siguiente_nivel)
+        nivel_actual = siguiente_nivel
+
+    return nodos
+
+
+def obtener_rutas_hojas(nodos):
+    return [nodo["ancestors"] + [nodo["_id"]] for nodo in nodos if nodo["isLeaf"]]
+
+
+def contar_nodos(profundidad, ramificacion, raices=1):
+    return raices * sum(ramificacion**nivel for nivel in range(profundidad + 1))
+
+
+def marcar_version_clasificadores(db):
+    db[COLECCION_VERSIONES].update_one(
+        {"_id": ID_VERSION_CLASIFICADORES},
+        {"$inc": {"version": 1}, "$set": {"updatedAt": datetime.now()}},
+        upsert=True,
+    )
+
+
+def insertar_clasificadores(db, nodos, tamano_lote=5000):
+    print(f"\nInsertando {len(nodos)} clasificadores en MongoDB...")
+
+    try:
+        db.classifiers.drop()
+        print("  Colección 'classifiers' limpiada")
+
+        insertados = 0
+        for i in range(0, len(nodos), tamano_lote):
+            result = db.classifiers.insert_many(
+                nodos[i : i + tamano_lote], ordered=False
+            )
+            insertados += len(result.inserted_ids)
+
+        marcar_version_clasificadores(db)
+        print(f"  ✅ {insertados} clasificadores insertados correctamente")
+        return True
+    except Exception as e:
+        print(f"  ❌ Error al insertar clasificadores: {e}")
+        return False
@@ -0,0 +1,135 @@
+from bson import ObjectId
+from contextlib import contextmanager
+from pymongo.errors import DuplicateKeyError
+import threading
+import time
+
+# Estado compartido entre procesos: marcas, resume tokens y los bloqueos que
+# ordenan a los escritores de ticket_events y daily_stats
+COLECCION_ESTADO = "backfill_state"
+
+ID_RECONSTRUCCION = "reconstruccion_resumen"
+
+# Los vencimientos se calculan con el reloj del servidor ($$NOW); un proceso
+# que muere sin liberar su documento deja de contar cuando este vence
+VIGENCIA_MS = 60 * 1000
+ESPERA = 1.0
+
+
+def renovar(estado, filtro, campos, vigencia_ms=VIGENCIA_MS):
+    estado.update_one(
+        filtro,
+        [{"$set": {**campos, "vence": {"$add": ["$$NOW", vigencia_ms]}}}],
+        upsert=True,
+    )
+
+
+def vigentes(estado, filtro):
+    return estado.count_documents({**filtro, "$expr": {"$gt": ["$vence", "$$NOW"]}})
+
+
+def ids_vigentes(estado, filtro):
+    return estado.distinct("_id", {**filtro, "$expr": {"$gt": ["$vence", "$$NOW"]}})
+
+
+@contextmanager
+def mantener_vigente(estado, filtro, campos):
+    """Renueva en segundo plano un documento ya creado y lo borra al salir"""
+    detener = threading.Event()
+
+    def renovar_periodicamente():
+        while not detener.wait(VIGENCIA_MS / 3000):
+            renovar(estado, filtro, campos)
+
+    hilo = threading.Thread(target=renovar_periodicamente, daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+        estado.delete_one(filtro)
+
+
+@contextmanager
+def escritura_resumen(db, tipo="lote"):
+    """Lote que escribe ticket_events o daily_stats; espera mientras haya
+    una reconstrucción del resumen en curso y entrega el id de su anuncio"""
+    estado = db[COLECCION_ESTADO]
+    filtro = {"_id": f"escritor:{tipo}:{ObjectId()}"}
+    campos = {"escritor": True, "tipo": tipo}
+    avisado = False
+
+    # El escritor se anuncia antes de mirar el bloqueo y la reconstrucción
+    # bloquea antes de contar escritores: al menos uno de los dos ve al otro
+    while True:
+        renovar(estado, filtro, campos)
+        if not vigentes(estado, {"_id": ID_RECONSTRUCCION}):
+            break
+        estado.delete_one(filtro)
+        if not avisado:
+            print("  ⏸️  Reconstrucción de daily_stats en curso, esperando...")
+            avisado = True
+        time.sleep(ESPERA)
+
+    with mantener_vigente(estado, filtro, campos):
+        yield filtro["_id"]
+
+
+@contextmanager
+def reconstruccion_exclusiva(db):
+    """Bloqueo para reescribir daily_stats desde los tickets: espera a que
+    terminen los lotes en curso y detiene los nuevos hasta liberarse"""
+    estado = db[COLECCION_ESTADO]
+    filtro = {"_id": ID_RECONSTRUCCION, "dueno": ObjectId()}
+    avisado = False
+
+    while True:
+        try:
+            # Con otro dueño el filtro no coincide y el upsert choca con su _id
+            renovar(estado, filtro, {})
+            break
+        except DuplicateKeyError:
+            estado.delete_one(
+                {"_id": ID_RECONSTRUCCION, "$expr": {"$lte": ["$vence", "$$NOW"]}}
+            )
+        if not avisado:
+            print("  ⏸️  Otra reconstrucción de daily_stats en curso, esperando...")
+            avisado = True
+        time.sleep(ESPERA)
+
+    with mantener_vigente(estado, filtro, {}):
+        avisado = False
+        while vigentes(estado, {"escritor": True}):
+            if not avisado:
+                print("  ⏸️  Esperando a que terminen los lotes en curso...")
+                avisado = True
+            time.sleep(ESPERA)
+        yield
+
+
+def hay_sincronizador(db):
+    return bool(vigentes(db[COLECCION_ESTADO], {"sincronizador": True}))
+
+
+@contextmanager
+def sincronizador_presente(db):
+    """Anuncia un sincronizador de tickets: las cargas que lo ven le dejan
+    los eventos y el resumen de los tickets nuevos. Espera a que terminen
+    las cargas que empezaron sin verlo"""
+    estado = db[COLECCION_ESTADO]
+    filtro = {"_id": f"sincronizador:{ObjectId()}"}
+    campos = {"sincronizador": True}
+    cargas = {"escritor": True, "tipo": "carga"}
+
+    # Mismo orden que escritura_resumen(): una carga que se anunció después
+    # de esta lectura ya ve al sincronizador
+    renovar(estado, filtro, campos)
+    with mantener_vigente(estado, filtro, campos):
+        previas = set(ids_vigentes(estado, cargas))
+        if previas:
+            print("  ⏸️  Esperando a que terminen las cargas de tickets en curso...")
+        while previas:
+            time.sleep(ESPERA)
+            previas &= set(ids_vigentes(estado, cargas))
+        yield
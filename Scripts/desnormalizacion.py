@@ -0,0 +1,267 @@
+CAMPOS_DESNORMALIZADOS = [
+    "reopenCount",
+    "stateChangeCount",
+    "commentCount",
+    "closedAt",
+    "lastStateChangeAt",
+    "lastModifiedAt",
+]
+
+# Ruta raíz → clasificador del ticket; depende del árbol, no del historial
+CAMPO_RUTA_CLASIFICADOR = "classifierPath"
+
+
+def calcular_reaperturas(history):
+    count = 0
+    for action in history:
+        if (
+            action.get("action") == "state_change"
+            and action.get("from") == "closed"
+            and action.get("to") != "closed"
+        ):
+            count += 1
+    return count
+
+
+def calcular_cambios_estado(history):
+    count = 0
+    for action in history:
+        if action.get("action") == "state_change":
+            count += 1
+    return count
+
+
+def calcular_comentarios(history):
+    count = 0
+    for action in history:
+        if action.get("action") == "comment":
+            count += 1
+    return count
+
+
+def obtener_fecha_cierre(history, current_state):
+    if current_state != "closed":
+        return None
+
+    for action in reversed(history):
+        if action.get("action") == "state_change" and action.get("to") == "closed":
+            return action.get("timestamp")
+
+    return None
+
+
+def obtener_ultimo_cambio_estado(history):
+    for action in reversed(history):
+        if action.get("action") == "state_change":
+            return action.get("timestamp")
+
+    return None
+
+
+def obtener_ultima_modificacion(history):
+    if history:
+        return history[-1].get("timestamp")
+    return None
+
+
+def reducir_historial(history, current_state=None):
+    reaperturas = 0
+    cambios_estado = 0
+    comentarios = 0
+    ultimo_cierre = None
+    ultimo_cambio_estado = None
+
+    for action in history:
+        tipo = action.get("action")
+
+        if tipo == "state_change":
+            cambios_estado += 1
+            ultimo_cambio_estado = action.get("timestamp")
+
+            if action.get("to") == "closed":
+                ultimo_cierre = ultimo_cambio_estado
+            elif action.get("from") == "closed":
+                reaperturas += 1
+
+        elif tipo == "comment":
+            comentarios += 1
+
+    return {
+        "reopenCount": reaperturas,
+        "stateChangeCount": cambios_estado,
+        "commentCount": comentarios,
+        "closedAt": ultimo_cierre if current_state == "closed" else None,
+        "lastStateChangeAt": ultimo_cambio_estado,
+        "lastModifiedAt": history[-1].get("timestamp") if history else None,
+    }
+
+
+def calcular_campos_desnormalizados(ticket):
+    reduccion = reducir_historial(ticket.get("history", []), ticket.get("currentState"))
+
+    campos = {
+        "reopenCount": reduccion["reopenCount"],
+        "stateChangeCount": reduccion["stateChangeCount"],
+        "commentCount": reduccion["commentCount"],
+        "lastModifiedAt": reduccion["lastModifiedAt"] or ticket.get("createdAt"),
+    }
+
+    if reduccion["closedAt"]:
+        campos["closedAt"] = reduccion["closedAt"]
+
+    if reduccion["lastStateChangeAt"]:
+        campos["lastStateChangeAt"] = reduccion["lastStateChangeAt"]
+
+    return campos
+
+
+def desnormalizar_ticket(ticket):
+    ticket.update(calcular_campos_desnormalizados(ticket))
+    return ticket
+
+
+def cargar_rutas_clasificadores(db):
+    return {
+        nodo["_id"]: nodo.get("ancestors", []) + [nodo["_id"]]
+        for nodo in db.classifiers.find({}, {"ancestors": 1})
+    }
+
+
+def ruta_clasificador(ticket, rutas):
+    clasificador = ticket.get("currentClassifications", {}).get("tipo_solicitud")
+    if clasificador is None:
+        return []
+    return rutas.get(clasificador, [clasificador])
+
+
+def construir_actualizacion(ticket, rutas=None):
+    campos = calcular_campos_desnormalizados(ticket)
+    if rutas is not None:
+        campos[CAMPO_RUTA_CLASIFICADOR] = ruta_clasificador(ticket, rutas)
+    actualizacion = {"$set": campos}
+
+    # Un ticket reabierto no debe conservar el closedAt de su cierre anterior
+    faltantes = {
+        campo: "" for campo in ("closedAt", "lastStateChangeAt") if campo not in campos
+    }
+    if faltantes:
+        actualizacion["$unset"] = faltantes
+
+    return actualizacion
+
+
+def filtrar_historial(condicion):
+    return {
+        "$filter": {
+            "input": {"$ifNull": ["$history", []]},
+            "as": "h",
+            "cond": condicion,
+        }
+    }
+
+
+ES_CAMBIO_ESTADO = {"$eq": ["$$h.action", "state_change"]}
+
+ES_REAPERTURA = {
+    "$and": [
+        ES_CAMBIO_ESTADO,
+        {"$eq": ["$$h.from", "closed"]},
+        {"$ne": ["$$h.to", "closed"]},
+    ]
+}
+
+ES_CIERRE = {"$and": [ES_CAMBIO_ESTADO, {"$eq": ["$$h.to", "closed"]}]}
+
+ES_COMENTARIO = {"$eq": ["$$h.action", "comment"]}
+
+
+def ultimo_timestamp(entradas):
+    return {
+        "$let": {
+            "vars": {"ultima": {"$arrayElemAt": [entradas, -1]}},
+            "in": "$$ultima.timestamp",
+        }
+    }
+
+
+def expresiones_desnormalizacion():
+    return {
+        "reopenCount": {"$size": filtrar_historial(ES_REAPERTURA)},
+        "stateChangeCount": {"$size": filtrar_historial(ES_CAMBIO_ESTADO)},
+        "commentCount": {"$size": filtrar_historial(ES_COMENTARIO)},
+        "closedAt": {
+            "$cond": [
+                {"$eq": ["$currentState", "closed"]},
+                {
+                    "$ifNull": [
+                        ultimo_timestamp(filtrar_historial(ES_CIERRE)),
+                        "$$REMOVE",
+                    ]
+                },
+                "$$REMOVE",
+            ]
+        },
+        "lastStateChangeAt": {
+            "$ifNull": [
+                ultimo_timestamp(filtrar_historial(ES_CAMBIO_ESTADO)),
+                "$$REMOVE",
+            ]
+        },
+        "lastModifiedAt": {
+            "$ifNull": [
+                ultimo_timestamp({"$ifNull": ["$history", []]}),
+                "$createdAt",
+            ]
+        },
+    }
+
+
+def pipeline_desnormalizacion():
+    return [{"$set": expresiones_desnormalizacion()}]
+
+
+def pipeline_rutas_clasificador(filtro=None):
+    # update_many no admite $lookup, así que la ruta se calcula con una
+    # agregación que escribe de vuelta en tickets con $merge
+    tipo = "$currentClassifications.tipo_solicitud"
+    return [
+        {"$match": filtro or {}},
+        {"$project": {"tipo": tipo}},
+        {
+            "$lookup": {
+                "from": "classifiers",
+                "localField": "tipo",
+                "foreignField": "_id",
+                "as": "nodo",
+            }
+        },
+        {
+            "$project": {
+                CAMPO_RUTA_CLASIFICADOR: {
+                    "$cond": [
+                        {"$ifNull": ["$tipo", False]},
+                        {
+                            "$concatArrays": [
+                                {
+                                    "$ifNull": [
+                                        {"$arrayElemAt": ["$nodo.ancestors", 0]},
+                                        [],
+                                    ]
+                                },
+                                ["$tipo"],
+                            ]
+                        },
+                        [],
+                    ]
+                }
+            }
+        },
+        {
+            "$merge": {
+                "into": "tickets",
+                "on": "_id",
+                "whenMatched": "merge",
+                "whenNotMatched": "discard",
+            }
+        },
+    ]
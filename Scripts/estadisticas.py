@@ -0,0 +1,125 @@
+from desnormalizacion import ES_CIERRE, ES_REAPERTURA, filtrar_historial
+
+LIMITE_CLASIFICADORES = 20
+
+
+def contar_en_historial(condicion):
+    return {"$size": filtrar_historial(condicion)}
+
+
+def pipeline_estadisticas(limite_clasificadores=LIMITE_CLASIFICADORES):
+    return [
+        {
+            "$facet": {
+                "porEstado": [
+                    {"$group": {"_id": "$currentState", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                ],
+                "porClasificador": [
+                    {
+                        "$group": {
+                            "_id": "$currentClassifications.tipo_solicitud",
+                            "count": {"$sum": 1},
+                        }
+                    },
+                    {"$sort": {"count": -1}},
+                    {"$limit": limite_clasificadores},
+                ],
+                "totales": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "totalTickets": {"$sum": 1},
+                            "reaperturasHistorial": {
+                                "$sum": contar_en_historial(ES_REAPERTURA)
+                            },
+                            "cierresHistorial": {
+                                "$sum": contar_en_historial(ES_CIERRE)
+                            },
+                            "totalReaperturas": {"$sum": "$reopenCount"},
+                            "ticketsConReaperturas": {
+                                "$sum": {"$cond": [{"$gt": ["$reopenCount", 0]}, 1, 0]}
+                            },
+                            "maxReaperturas": {"$max": "$reopenCount"},
+                            "ticketsCerrados": {
+                                "$sum": {
+                                    "$cond": [
+                                        {"$eq": ["$currentState", "closed"]},
+                                        1,
+                                        0,
+                                    ]
+                                }
+                            },
+                            "ticketsConFechaCierre": {
+                                "$sum": {
+                                    "$cond": [
+                                        {"$eq": [{"$type": "$closedAt"}, "missing"]},
+                                        0,
+                                        1,
+                                    ]
+                                }
+                            },
+                            "totalComentarios": {"$sum": "$commentCount"},
+                            "promedioComentarios": {"$avg": "$commentCount"},
+                            "maxComentarios": {"$max": "$commentCount"},
+                            "totalCambios": {"$sum": "$stateChangeCount"},
+                            "promedioCambios": {"$avg": "$stateChangeCount"},
+                            "maxCambios": {"$max": "$stateChangeCount"},
+                        }
+                    }
+                ],
+            }
+        }
+    ]
+
+
+def calcular_estadisticas(db, limite_clasificadores=LIMITE_CLASIFICADORES):
+    resultado = next(
+        db.tickets.aggregate(
+            pipeline_estadisticas(limite_clasificadores), allowDiskUse=True
+        ),
+        {},
+    )
+    totales = resultado.get("totales") or [{}]
+
+    return {
+        "porEstado": resultado.get("porEstado", []),
+        "porClasificador": resultado.get("porClasificador", []),
+        **totales[0],
+    }
+
+
+def imprimir_resumen_generacion(stats):
+    print(f"  Total de tickets: {stats.get('totalTickets', 0)}")
+
+    print("\n  Tickets por estado:")
+    for item in stats["porEstado"]:
+        print(f"    - {item['_id']}: {item['count']}")
+
+    print(f"\n  Tickets por clasificador (top {LIMITE_CLASIFICADORES}):")
+    for item in stats["porClasificador"]:
+        print(f"    - {item['_id']}: {item['count']}")
+
+    print(f"\n  Total de reaperturas: {stats.get('reaperturasHistorial', 0)}")
+    print(f"  Total de cierres: {stats.get('cierresHistorial', 0)}")
+
+
+def imprimir_resumen_desnormalizacion(stats):
+    print(f"\n🔄 Reaperturas:")
+    print(f"  Total de reaperturas: {stats.get('totalReaperturas', 0)}")
+    print(f"  Tickets con reaperturas: {stats.get('ticketsConReaperturas', 0)}")
+    print(f"  Máximo de reaperturas en un ticket: {stats.get('maxReaperturas', 0)}")
+
+    print(f"\n📅 Fechas de cierre:")
+    print(f"  Tickets cerrados: {stats.get('ticketsCerrados', 0)}")
+    print(f"  Tickets con closedAt: {stats.get('ticketsConFechaCierre', 0)}")
+
+    print(f"\n💬 Comentarios:")
+    print(f"  Total de comentarios: {stats.get('totalComentarios', 0)}")
+    print(f"  Promedio por ticket: {stats.get('promedioComentarios') or 0:.2f}")
+    print(f"  Máximo en un ticket: {stats.get('maxComentarios', 0)}")
+
+    print(f"\n🔄 Cambios de estado:")
+    print(f"  Total de cambios: {stats.get('totalCambios', 0)}")
+    print(f"  Promedio por ticket: {stats.get('promedioCambios') or 0:.2f}")
+    print(f"  Máximo en un ticket: {stats.get('maxCambios', 0)}")
@@ -0,0 +1,138 @@
+from pymongo import DeleteMany, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+# Cada entrada de history se replica como un documento propio para que las
+# consultas de transiciones usen índices en lugar de $unwind
+COLECCION_EVENTOS = "ticket_events"
+
+CAMPOS_EVENTO = ["action", "timestamp", "userId", "from", "to"]
+
+
+def eventos_de_ticket(ticket, ruta=None):
+    ticket_id = ticket["_id"]
+    clasificacion = ticket.get("currentClassifications") or {}
+    ruta = ruta if ruta is not None else ticket.get("classifierPath", [])
+    eventos = []
+
+    for seq, entrada in enumerate(ticket.get("history", [])):
+        evento = {
+            "_id": f"{ticket_id}:{seq}",
+            "ticketId": ticket_id,
+            "seq": seq,
+            "classifier": clasificacion.get("tipo_solicitud"),
+            "classifierPath": list(ruta),
+        }
+        for campo in CAMPOS_EVENTO:
+            if campo in entrada:
+                evento[campo] = entrada[campo]
+        eventos.append(evento)
+
+    return eventos
+
+
+def insertar_eventos(coleccion, tickets):
+    eventos = [evento for ticket in tickets for evento in eventos_de_ticket(ticket)]
+    if not eventos:
+        return 0
+
+    # El _id es determinista (ticket:posición); un evento repetido falla sin
+    # afectar al resto del lote y se devuelve como error
+    try:
+        coleccion.insert_many(eventos, ordered=False)
+        return 0
+    except BulkWriteError as e:
+        return len(e.details.get("writeErrors", []))
+
+
+def operaciones_eventos(ticket, ruta=None):
+    eventos = eventos_de_ticket(ticket, ruta)
+    operaciones = [
+        ReplaceOne({"_id": evento["_id"]}, evento, upsert=True) for evento in eventos
+    ]
+    # Eventos sobrantes si el historial quedó más corto que la réplica
+    operaciones.append(
+        DeleteMany({"ticketId": ticket["_id"], "seq": {"$gte": len(eventos)}})
+    )
+    return operaciones
+
+
+def pipeline_eventos(filtro=None):
+    # Versión en servidor: desenrolla el historial y lo escribe con $merge
+    return [
+        {"$match": filtro or {}},
+        {
+            "$project": {
+                "history": 1,
+                "classifier": "$currentClassifications.tipo_solicitud",
+                "classifierPath": {"$ifNull": ["$classifierPath", []]},
+            }
+        },
+        {"$unwind": {"path": "$history", "includeArrayIndex": "seq"}},
+        {
+            "$project": {
+                "_id": {"$concat": [{"$toString": "$_id"}, ":", {"$toString": "$seq"}]},
+                "ticketId": "$_id",
+                "seq": {"$toInt": "$seq"},
+                "classifier": 1,
+                "classifierPath": 1,
+                **{campo: f"$history.{campo}" for campo in CAMPOS_EVENTO},
+            }
+        },
+        {
+            "$merge": {
+                "into": COLECCION_EVENTOS,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def pipeline_eventos_sobrantes(filtro=None):
+    # Eventos con seq >= len(history): $merge solo inserta o reemplaza, así
+    # que los que sobran tras acortarse un historial hay que buscarlos aparte
+    return [
+        {"$match": filtro or {}},
+        {"$project": {"largo": {"$size": {"$ifNull": ["$history", []]}}}},
+        {
+            "$lookup": {
+                "from": COLECCION_EVENTOS,
+                "let": {"ticket": "$_id", "largo": "$largo"},
+                "pipeline": [
+                    {
+                        "$match": {
+                            "$expr": {
+                                "$and": [
+                                    {"$eq": ["$ticketId", "$$ticket"]},
+                                    {"$gte": ["$seq", "$$largo"]},
+                                ]
+                            }
+                        }
+                    },
+                    {"$project": {"_id": 1}},
+                ],
+                "as": "sobrantes",
+            }
+        },
+        {"$unwind": "$sobrantes"},
+        {"$replaceWith": "$sobrantes"},
+    ]
+
+
+def borrar_eventos_sobrantes(coleccion, filtro=None, tamano_lote=1000):
+    # Al cliente solo llegan los _id de los eventos a borrar
+    eventos = coleccion.database[COLECCION_EVENTOS]
+    borrados = 0
+    lote = []
+
+    for evento in coleccion.aggregate(pipeline_eventos_sobrantes(filtro)):
+        lote.append(evento["_id"])
+        if len(lote) >= tamano_lote:
+            borrados += eventos.delete_many({"_id": {"$in": lote}}).deleted_count
+            lote = []
+
+    if lote:
+        borrados += eventos.delete_many({"_id": {"$in": lote}}).deleted_count
+
+    return borrados
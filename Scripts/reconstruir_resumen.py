@@ -0,0 +1,53 @@
+from pymongo import MongoClient
+import argparse
+import time
+
+from eventos import COLECCION_EVENTOS
+from resumen_diario import COLECCION_RESUMEN, reconstruir_resumen
+from update_tickets import MONGO_URI
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=f"Reconstruye '{COLECCION_RESUMEN}' (totales por día, "
+        "clasificador y estado) a partir de la réplica de history en "
+        f"'{COLECCION_EVENTOS}'"
+    )
+    parser.add_argument(
+        "--uri",
+        default=MONGO_URI,
+        help="URI de MongoDB (default: la misma de update_tickets.py)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    db = MongoClient(args.uri)["capta_tickets"]
+
+    print("=" * 60)
+    print("📅 RECONSTRUCCIÓN DEL RESUMEN DIARIO")
+    print("=" * 60)
+
+    if (
+        db.tickets.estimated_document_count()
+        and not db[COLECCION_EVENTOS].estimated_document_count()
+    ):
+        print(
+            f"⚠️  '{COLECCION_EVENTOS}' está vacía: el resumen quedaría vacío. "
+            "Ejecuta antes update_tickets.py para replicar history"
+        )
+        return
+
+    inicio = time.perf_counter()
+    resultado = reconstruir_resumen(db)
+
+    print(
+        f"\n✅ {resultado['tickets']} tickets resumidos en "
+        f"{resultado['documentos']} documentos de '{COLECCION_RESUMEN}' "
+        f"({time.perf_counter() - inicio:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,604 @@
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from coordinacion import COLECCION_ESTADO, ids_vigentes, reconstruccion_exclusiva
+from eventos import COLECCION_EVENTOS
+from desnormalizacion import (
+    ES_CAMBIO_ESTADO,
+    ES_CIERRE,
+    ES_REAPERTURA,
+    reducir_historial,
+)
+
+# Un documento por día × clasificador × estado actual del ticket; el
+# dashboard suma unos cientos de estos en lugar de recorrer los tickets
+COLECCION_RESUMEN = "daily_stats"
+
+CONTADORES = ["created", "closed", "reopened", "resolved", "resolutionMs"]
+
+# Marcas en backfill_state de los documentos que un lote va a modificar
+TIPO_REPARACION = "reparacion_resumen"
+
+EPOCA = datetime(1970, 1, 1)
+
+
+def dia(timestamp):
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def milisegundos(timestamp):
+    # BSON guarda milisegundos: truncar igual evita diferencias entre un
+    # ticket recién generado y su copia leída de vuelta desde MongoDB
+    return (timestamp - EPOCA) // timedelta(milliseconds=1)
+
+
+def id_resumen(clave):
+    fecha, clasificador, estado = clave
+    return f"{fecha:%Y-%m-%d}:{clasificador}:{estado}"
+
+
+def estado_final(history):
+    estado = "open"
+    for entrada in history:
+        if entrada.get("action") == "state_change" and entrada.get("to"):
+            estado = entrada.get("to")
+    return estado
+
+
+def acumular_contribucion(acumulado, ticket, ruta=None):
+    # Todo se deriva de history (no de currentState ni createdAt) para poder
+    # recalcular la contribución anterior a partir de ticket_events
+    history = list(ticket.get("history", []))
+    clasificacion = ticket.get("currentClassifications") or {}
+    clasificador = clasificacion.get("tipo_solicitud") or ""
+    ruta = list(ruta if ruta is not None else ticket.get("classifierPath", []))
+    estado = estado_final(history)
+
+    def sumar(timestamp, **valores):
+        clave = (dia(timestamp), clasificador, estado)
+        bucket = acumulado.setdefault(
+            clave, {"classifierPath": ruta, **{c: 0 for c in CONTADORES}}
+        )
+        for contador, valor in valores.items():
+            bucket[contador] += valor
+
+    creado = None
+    for entrada in history:
+        tipo = entrada.get("action")
+        timestamp = entrada.get("timestamp")
+        if timestamp is None:
+            continue
+
+        if tipo == "created" and creado is None:
+            creado = timestamp
+            sumar(timestamp, created=1)
+        elif tipo == "state_change" and entrada.get("to") == "closed":
+            sumar(timestamp, closed=1)
+        elif tipo == "state_change" and entrada.get("from") == "closed":
+            sumar(timestamp, reopened=1)
+
+    # El tiempo de resolución se asigna al día de creación, igual que el
+    # filtro por createdAt de get_resolution_time
+    cierre = reducir_historial(history, estado)["closedAt"]
+    if creado is not None and cierre is not None:
+        sumar(
+            creado,
+            resolved=1,
+            resolutionMs=milisegundos(cierre) - milisegundos(creado),
+        )
+
+    return acumulado
+
+
+def contribuciones_anteriores(coleccion_eventos, ids):
+    """Contribución de cada ticket según su réplica actual en ticket_events"""
+    eventos_por_ticket = {}
+    for evento in coleccion_eventos.find({"ticketId": {"$in": list(ids)}}):
+        eventos_por_ticket.setdefault(evento["ticketId"], []).append(evento)
+
+    acumulado = {}
+    for ticket_id, eventos in eventos_por_ticket.items():
+        eventos.sort(key=lambda evento: evento["seq"])
+        ticket = {
+            "_id": ticket_id,
+            "history": eventos,
+            "currentClassifications": {"tipo_solicitud": eventos[0].get("classifier")},
+        }
+        acumular_contribucion(acumulado, ticket, eventos[0].get("classifierPath", []))
+
+    return acumulado
+
+
+def operaciones_resumen(nuevas, anteriores=None):
+    anteriores = anteriores or {}
+    operaciones = []
+
+    for clave in sorted(nuevas.keys() | anteriores.keys()):
+        nueva = nuevas.get(clave)
+        anterior = anteriores.get(clave)
+
+        # Se incrementan todos los contadores (aunque sea en 0) para que un
+        # documento creado por el upsert los tenga siempre
+        incrementos = {
+            contador: (nueva[contador] if nueva else 0)
+            - (anterior[contador] if anterior else 0)
+            for contador in CONTADORES
+        }
+
+        ruta_cambiada = nueva is not None and (
+            anterior is None or anterior["classifierPath"] != nueva["classifierPath"]
+        )
+        if not any(incrementos.values()) and not ruta_cambiada:
+            continue
+
+        fecha, clasificador, estado = clave
+        actualizacion = {
+            "$setOnInsert": {"day": fecha, "classifier": clasificador, "state": estado},
+            "$inc": incrementos,
+        }
+        if nueva is not None:
+            actualizacion["$set"] = {"classifierPath": nueva["classifierPath"]}
+        else:
+            actualizacion["$setOnInsert"]["classifierPath"] = anterior["classifierPath"]
+
+        operaciones.append(
+            UpdateOne({"_id": id_resumen(clave)}, actualizacion, upsert=True)
+        )
+
+    return operaciones
+
+
+def acumular_tickets(tickets):
+    acumulado = {}
+    for ticket in tickets:
+        acumular_contribucion(acumulado, ticket)
+    return acumulado
+
+
+def sumar_contribuciones(coleccion, acumulado):
+    """Suma al resumen contribuciones de tickets que no tenían una anterior"""
+    operaciones = operaciones_resumen(acumulado)
+    if not operaciones:
+        return 0
+
+    try:
+        coleccion.bulk_write(operaciones, ordered=False)
+        return 0
+    except BulkWriteError as e:
+        return len(e.details.get("writeErrors", []))
+
+
+def claves_contribuciones(*acumulados):
+    claves = set()
+    for acumulado in acumulados:
+        claves.update(acumulado or {})
+    return claves
+
+
+def registrar_reparacion(db, id_escritor, claves, ids, tamano=5000):
+    # Se anota antes de escribir qué documentos de daily_stats y qué tickets
+    # toca el lote; si la diferencia o los eventos quedan a medias la marca
+    # sigue ahí y reparar_pendientes() recalcula esos documentos
+    estado = db[COLECCION_ESTADO]
+    claves = [list(clave) for clave in sorted(claves)]
+    ids = list(ids)
+    documentos = [
+        {"tipo": TIPO_REPARACION, "lote": id_escritor, "claves": claves[i : i + tamano]}
+        for i in range(0, len(claves), tamano)
+    ] + [
+        {"tipo": TIPO_REPARACION, "lote": id_escritor, "tickets": ids[i : i + tamano]}
+        for i in range(0, len(ids), tamano)
+    ]
+    if not documentos:
+        return []
+    return estado.insert_many(documentos).inserted_ids
+
+
+def cerrar_reparacion(db, ids_reparacion):
+    if ids_reparacion:
+        db[COLECCION_ESTADO].delete_many({"_id": {"$in": list(ids_reparacion)}})
+
+
+def hay_reparaciones_pendientes(db):
+    # Las marcas de un lote que sigue escribiendo no están pendientes
+    estado = db[COLECCION_ESTADO]
+    activos = ids_vigentes(estado, {"escritor": True})
+    return bool(
+        estado.count_documents(
+            {"tipo": TIPO_REPARACION, "lote": {"$nin": activos}}, limit=1
+        )
+    )
+
+
+def reparar_pendientes(db):
+    """Recalcula desde ticket_events los documentos de daily_stats que dejaron
+    marcados lotes con errores o interrumpidos"""
+    if not hay_reparaciones_pendientes(db):
+        return 0
+
+    estado = db[COLECCION_ESTADO]
+    reparados = 0
+    with reconstruccion_exclusiva(db):
+        # Con el bloqueo no queda ningún lote escribiendo: todas las marcas
+        # que siguen ahí son de lotes que no terminaron
+        for marca in estado.find({"tipo": TIPO_REPARACION}):
+            claves = {tuple(clave) for clave in marca.get("claves", [])}
+            reparados += reparar_resumen(db, claves, marca.get("tickets", []))
+            estado.delete_one({"_id": marca["_id"]})
+    return reparados
+
+
+def filtros_dias(claves, tamano=200):
+    # Un ticket aporta a un día solo si tiene algún evento ese día; no se
+    # filtra por clasificador porque una réplica reescrita a medias puede
+    # mezclar el de dos versiones del ticket
+    dias = sorted({fecha for fecha, _, _ in claves})
+    for inicio in range(0, len(dias), tamano):
+        yield {
+            "$or": [
+                {"timestamp": {"$gte": fecha, "$lt": fecha + timedelta(days=1)}}
+                for fecha in dias[inicio : inicio + tamano]
+            ]
+        }
+
+
+def reparar_resumen(db, claves, ids=()):
+    """Recalcula desde ticket_events los documentos indicados de daily_stats
+    y los que aportan ahora los eventos de los tickets indicados"""
+    # Reemplaza en lugar de sumar, así que repetirla da el mismo resultado.
+    # Debe ejecutarse con reconstruccion_exclusiva()
+    eventos = db[COLECCION_EVENTOS]
+    claves = set(claves) | set(contribuciones_anteriores(eventos, ids))
+
+    ids_dias = set()
+    for filtro in filtros_dias(claves):
+        ids_dias.update(eventos.distinct("ticketId", filtro))
+    acumulado = contribuciones_anteriores(eventos, ids_dias)
+
+    operaciones = []
+    for clave in sorted(claves):
+        bucket = acumulado.get(clave)
+        if bucket is None or not any(bucket[contador] for contador in CONTADORES):
+            operaciones.append(DeleteOne({"_id": id_resumen(clave)}))
+            continue
+
+        fecha, clasificador, estado = clave
+        documento = {
+            "day": fecha,
+            "classifier": clasificador,
+            "state": estado,
+            **bucket,
+        }
+        operaciones.append(
+            ReplaceOne({"_id": id_resumen(clave)}, documento, upsert=True)
+        )
+
+    if operaciones:
+        db[COLECCION_RESUMEN].bulk_write(operaciones, ordered=False)
+    return len(operaciones)
+
+
+def filtrar(entradas, condicion):
+    return {"$filter": {"input": entradas, "as": "h", "cond": condicion}}
+
+
+def ultima(entradas, campo):
+    return {
+        "$let": {
+            "vars": {"ultima": {"$arrayElemAt": [entradas, -1]}},
+            "in": f"$$ultima.{campo}",
+        }
+    }
+
+
+def inicio_dia(fecha):
+    return {
+        "$dateFromParts": {
+            "year": {"$year": fecha},
+            "month": {"$month": fecha},
+            "day": {"$dayOfMonth": fecha},
+        }
+    }
+
+
+CON_FECHA = {"$gt": ["$$h.timestamp", None]}
+
+
+def etapas_contribucion():
+    # Versión en servidor de acumular_contribucion(): recibe documentos con
+    # historial, classifier, classifierPath y signo (+1 o -1) y devuelve un
+    # documento por día × clasificador × estado con los contadores sumados
+    historial = "$historial"
+    cambio_con_destino = {"$and": [ES_CAMBIO_ESTADO, {"$gt": ["$$h.to", None]}]}
+    creacion = {"$and": [{"$eq": ["$$h.action", "created"]}, CON_FECHA]}
+
+    def por_entrada(condicion, contador):
+        return {
+            "$map": {
+                "input": filtrar(historial, {"$and": [condicion, CON_FECHA]}),
+                "as": "h",
+                "in": {"day": inicio_dia("$$h.timestamp"), contador: "$signo"},
+            }
+        }
+
+    return [
+        {
+            "$set": {
+                "estado": {
+                    "$ifNull": [
+                        ultima(filtrar(historial, cambio_con_destino), "to"),
+                        "open",
+                    ]
+                },
+                "creado": {
+                    "$let": {
+                        "vars": {
+                            "primera": {
+                                "$arrayElemAt": [filtrar(historial, creacion), 0]
+                            }
+                        },
+                        "in": "$$primera.timestamp",
+                    }
+                },
+            }
+        },
+        {
+            "$set": {
+                "cierre": {
+                    "$cond": [
+                        {"$eq": ["$estado", "closed"]},
+                        ultima(filtrar(historial, ES_CIERRE), "timestamp"),
+                        None,
+                    ]
+                }
+            }
+        },
+        {
+            "$project": {
+                "classifier": {"$ifNull": ["$classifier", ""]},
+                "classifierPath": 1,
+                "estado": 1,
+                "signo": 1,
+                "entradas": {
+                    "$concatArrays": [
+                        {
+                            "$cond": [
+                                {"$gt": ["$creado", None]},
+                                [
+                                    {
+                                        "day": inicio_dia("$creado"),
+                                        "created": "$signo",
+                                        "resolved": {
+                                            "$cond": [
+                                                {"$gt": ["$cierre", None]},
+                                                "$signo",
+                                                0,
+                                            ]
+                                        },
+                                        "resolutionMs": {
+                                            "$cond": [
+                                                {"$gt": ["$cierre", None]},
+                                                {
+                                                    "$multiply": [
+                                                        {
+                                                            "$subtract": [
+                                                                "$cierre",
+                                                                "$creado",
+                                                            ]
+                                                        },
+                                                        "$signo",
+                                                    ]
+                                                },
+                                                0,
+                                            ]
+                                        },
+                                    }
+                                ],
+                                [],
+                            ]
+                        },
+                        por_entrada(ES_CIERRE, "closed"),
+                        por_entrada(ES_REAPERTURA, "reopened"),
+                    ]
+                },
+            }
+        },
+        {"$unwind": "$entradas"},
+        {
+            "$group": {
+                "_id": {
+                    "day": "$entradas.day",
+                    "classifier": "$classifier",
+                    "state": "$estado",
+                },
+                # La ruta vigente es la de las contribuciones nuevas (signo +1)
+                "classifierPath": {
+                    "$max": {"$cond": [{"$gt": ["$signo", 0]}, "$classifierPath", None]}
+                },
+                **{
+                    contador: {"$sum": {"$ifNull": [f"$entradas.{contador}", 0]}}
+                    for contador in CONTADORES
+                },
+            }
+        },
+        {
+            "$project": {
+                "_id": {
+                    "$concat": [
+                        {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id.day"}},
+                        ":",
+                        "$_id.classifier",
+                        ":",
+                        "$_id.state",
+                    ]
+                },
+                "day": "$_id.day",
+                "classifier": "$_id.classifier",
+                "state": "$_id.state",
+                "classifierPath": 1,
+                **{contador: 1 for contador in CONTADORES},
+            }
+        },
+    ]
+
+
+def version_ticket(signo):
+    return {
+        "historial": {"$ifNull": ["$history", []]},
+        "classifier": "$currentClassifications.tipo_solicitud",
+        "classifierPath": {"$ifNull": ["$classifierPath", []]},
+        "signo": {"$literal": signo},
+    }
+
+
+def pipeline_reconstruccion(id_reconstruccion):
+    # Se resume ticket_events y no tickets: daily_stats siempre es la suma de
+    # lo que hay en la réplica, que es contra lo que se calculan las
+    # diferencias de cada lote
+    return [
+        {"$sort": {"ticketId": 1, "seq": 1}},
+        {
+            "$group": {
+                "_id": "$ticketId",
+                "historial": {
+                    "$push": {
+                        "action": "$action",
+                        "timestamp": "$timestamp",
+                        "from": "$from",
+                        "to": "$to",
+                    }
+                },
+                "classifier": {"$first": "$classifier"},
+                "classifierPath": {"$first": "$classifierPath"},
+            }
+        },
+        {
+            "$set": {
+                "classifierPath": {"$ifNull": ["$classifierPath", []]},
+                "signo": {"$literal": 1},
+            }
+        },
+        *etapas_contribucion(),
+        {"$set": {"rebuild": id_reconstruccion}},
+        {
+            "$merge": {
+                "into": COLECCION_RESUMEN,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def etapas_versiones(filtro=None):
+    # Cada ticket del filtro aporta su versión actual (+1) y la de su réplica
+    # en ticket_events (-1)
+    anterior = {
+        "historial": "$eventos",
+        "classifier": {"$arrayElemAt": ["$eventos.classifier", 0]},
+        "classifierPath": {
+            "$ifNull": [{"$arrayElemAt": ["$eventos.classifierPath", 0]}, []]
+        },
+        "signo": {"$literal": -1},
+    }
+
+    return [
+        {"$match": filtro or {}},
+        {
+            "$lookup": {
+                "from": COLECCION_EVENTOS,
+                "localField": "_id",
+                "foreignField": "ticketId",
+                "pipeline": [
+                    {"$sort": {"seq": 1}},
+                    {
+                        "$project": {
+                            "action": 1,
+                            "timestamp": 1,
+                            "from": 1,
+                            "to": 1,
+                            "classifier": 1,
+                            "classifierPath": 1,
+                        }
+                    },
+                ],
+                "as": "eventos",
+            }
+        },
+        {"$project": {"versiones": [version_ticket(1), anterior]}},
+        {"$unwind": "$versiones"},
+        {"$replaceWith": "$versiones"},
+    ]
+
+
+def pipeline_diferencias(filtro=None):
+    # Versión en servidor de operaciones_resumen(): la contribución anterior
+    # sale de ticket_events, así que debe ejecutarse antes de pipeline_eventos
+    return [
+        *etapas_versiones(filtro),
+        *etapas_contribucion(),
+        {
+            "$merge": {
+                "into": COLECCION_RESUMEN,
+                "on": "_id",
+                "whenMatched": [
+                    {
+                        "$set": {
+                            **{
+                                contador: {
+                                    "$add": [f"${contador}", f"$$new.{contador}"]
+                                }
+                                for contador in CONTADORES
+                            },
+                            "classifierPath": {
+                                "$ifNull": ["$$new.classifierPath", "$classifierPath"]
+                            },
+                        }
+                    }
+                ],
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def pipeline_claves(filtro=None):
+    # Documentos de daily_stats a los que aportan los tickets del filtro, ya
+    # sea con su versión actual o con la de ticket_events
+    return [
+        *etapas_versiones(filtro),
+        *etapas_contribucion(),
+        {"$project": {"_id": 0, "day": 1, "classifier": 1, "state": 1}},
+    ]
+
+
+def claves_filtro(coleccion, filtro=None):
+    return {
+        (clave["day"], clave["classifier"], clave["state"])
+        for clave in coleccion.aggregate(pipeline_claves(filtro), allowDiskUse=True)
+    }
+
+
+def reconstruir_resumen(db):
+    # Se calcula y escribe en el servidor con $merge; cada documento queda
+    # marcado con el id de esta reconstrucción y luego se borran los que no
+    # lo tienen. Los índices se conservan y el dashboard nunca ve la
+    # colección vacía. Un $inc concurrente se perdería con el reemplazo, así
+    # que los demás escritores esperan mientras dura
+    id_reconstruccion = ObjectId()
+    coleccion = db[COLECCION_RESUMEN]
+    with reconstruccion_exclusiva(db):
+        db[COLECCION_EVENTOS].aggregate(
+            pipeline_reconstruccion(id_reconstruccion), allowDiskUse=True
+        )
+        coleccion.delete_many({"rebuild": {"$ne": id_reconstruccion}})
+        # Todo quedó recalculado, también lo que marcaron lotes con errores
+        db[COLECCION_ESTADO].delete_many({"tipo": TIPO_REPARACION})
+
+    return {
+        "tickets": db.tickets.estimated_document_count(),
+        "documentos": coleccion.count_documents({"rebuild": id_reconstruccion}),
+    }
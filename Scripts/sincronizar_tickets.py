@@ -0,0 +1,278 @@
+from pymongo import DeleteMany, MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+from datetime import datetime
+import argparse
+import time
+
+from coordinacion import sincronizador_presente
+from desnormalizacion import (
+    CAMPO_RUTA_CLASIFICADOR,
+    CAMPOS_DESNORMALIZADOS,
+    cargar_rutas_clasificadores,
+)
+from update_tickets import (
+    COLECCION_ESTADO,
+    MONGO_URI,
+    PROYECCION_BACKFILL,
+    ejecutar_lote_con_eventos,
+    operacion_actualizacion,
+    operaciones_eventos_ticket,
+    contribuciones_tickets,
+)
+from resumen_diario import reparar_pendientes
+
+ID_TOKEN = "sincronizacion_tickets"
+
+# Código de MongoDB cuando el resume token ya salió del oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# Operaciones que cierran el change stream: la colección ya no existe
+OPERACIONES_INVALIDANTES = ["drop", "rename", "dropDatabase", "invalidate"]
+
+
+def pipeline_cambios():
+    # Las escrituras que solo tocan campos desnormalizados (incluidas las de
+    # este mismo proceso) se descartan en el servidor para no entrar en bucle
+    campos_propios = CAMPOS_DESNORMALIZADOS + [CAMPO_RUTA_CLASIFICADOR]
+    campos_modificados = {
+        "$concatArrays": [
+            {
+                "$map": {
+                    "input": {"$objectToArray": "$updateDescription.updatedFields"},
+                    "in": "$$this.k",
+                }
+            },
+            {"$ifNull": ["$updateDescription.removedFields", []]},
+            # Un $pop o un $set que acorta history solo aparece aquí
+            {
+                "$map": {
+                    "input": {"$ifNull": ["$updateDescription.truncatedArrays", []]},
+                    "in": "$$this.field",
+                }
+            },
+        ]
+    }
+
+    return [
+        {
+            "$match": {
+                "$expr": {
+                    "$or": [
+                        {
+                            "$in": [
+                                "$operationType",
+                                ["insert", "replace", "delete"]
+                                + OPERACIONES_INVALIDANTES,
+                            ]
+                        },
+                        {
+                            "$and": [
+                                {"$eq": ["$operationType", "update"]},
+                                {
+                                    "$gt": [
+                                        {
+                                            "$size": {
+                                                "$filter": {
+                                                    "input": campos_modificados,
+                                                    "cond": {
+                                                        "$not": {
+                                                            "$in": [
+                                                                "$$this",
+                                                                campos_propios,
+                                                            ]
+                                                        }
+                                                    },
+                                                }
+                                            }
+                                        },
+                                        0,
+                                    ]
+                                },
+                            ]
+                        },
+                    ]
+                }
+            }
+        },
+        {"$project": {"operationType": 1, "documentKey": 1}},
+    ]
+
+
+def leer_token(db):
+    estado = db[COLECCION_ESTADO].find_one({"_id": ID_TOKEN})
+    return estado.get("resumeToken") if estado else None
+
+
+def guardar_token(db, token):
+    db[COLECCION_ESTADO].update_one(
+        {"_id": ID_TOKEN},
+        {"$set": {"resumeToken": token, "updatedAt": datetime.now()}},
+        upsert=True,
+    )
+
+
+def recalcular_tickets(coleccion, ids, rutas):
+    operaciones = []
+    eventos = []
+    tickets = list(coleccion.find({"_id": {"$in": list(ids)}}, PROYECCION_BACKFILL))
+    for ticket in tickets:
+        operaciones.append(operacion_actualizacion(ticket, rutas))
+        eventos.extend(operaciones_eventos_ticket(ticket, rutas))
+
+    # Un ticket borrado deja de tener eventos y de sumar en el resumen diario
+    borrados = set(ids) - {ticket["_id"] for ticket in tickets}
+    if borrados:
+        eventos.append(DeleteMany({"ticketId": {"$in": list(borrados)}}))
+
+    contribuciones = contribuciones_tickets(coleccion, tickets, rutas, ids)
+    return ejecutar_lote_con_eventos(coleccion, operaciones, eventos, contribuciones)
+
+
+def sincronizar(
+    db, tamano_lote=500, espera_maxima=1.0, desde_ahora=False, reintentos=3
+):
+    token = None if desde_ahora else leer_token(db)
+
+    if token:
+        print("▶️  Reanudando desde el último resume token guardado")
+    else:
+        print("▶️  Iniciando desde el momento actual")
+
+    # El árbol de clasificadores cambia poco: se carga una vez por ejecución
+    rutas = cargar_rutas_clasificadores(db)
+
+    pendientes = set()
+    ultimo_token = token
+    ultimo_vaciado = time.monotonic()
+    actualizados = 0
+    errores = 0
+    intentos = 0
+    invalidado = None
+
+    # El stream se abre antes de anunciarse: un ticket que una carga inserte
+    # sin ver al sincronizador llega igual por el stream, y se procesa
+    # después de que esa carga escribió sus eventos (la diferencia es cero)
+    with db.tickets.watch(
+        pipeline_cambios(),
+        resume_after=token,
+        max_await_time_ms=int(espera_maxima * 1000),
+        batch_size=tamano_lote,
+    ) as stream, sincronizador_presente(db):
+        reparar_pendientes(db)
+        while stream.alive:
+            cambio = stream.try_next()
+            if cambio is None:
+                pass
+            elif cambio["operationType"] in OPERACIONES_INVALIDANTES:
+                invalidado = invalidado or cambio["operationType"]
+            else:
+                pendientes.add(cambio["documentKey"]["_id"])
+
+            vencido = time.monotonic() - ultimo_vaciado >= espera_maxima
+            if len(pendientes) >= tamano_lote or vencido:
+                ultimo_vaciado = time.monotonic()
+                if pendientes:
+                    modificados, fallidos = recalcular_tickets(
+                        db.tickets, pendientes, rutas
+                    )
+                    actualizados += modificados
+                    errores += fallidos
+                    print(
+                        f"  🔄 {len(pendientes)} tickets recalculados "
+                        f"(total actualizados: {actualizados}, errores: {errores})"
+                    )
+
+                    # Con errores el lote se conserva y el token no avanza; los
+                    # documentos del resumen que tocaba ya se recalcularon
+                    # desde ticket_events, así que el reintento calcula su
+                    # diferencia contra lo que quedó escrito
+                    if fallidos:
+                        intentos += 1
+                        if intentos > reintentos:
+                            print(
+                                f"\n❌ El lote sigue fallando tras {reintentos} "
+                                "reintentos; se detiene sin guardar el token"
+                            )
+                            print("   Al reiniciar se reprocesa desde el último token")
+                            return
+                        print(f"  ⚠️  Reintento {intentos}/{reintentos} del lote")
+                        continue
+
+                    intentos = 0
+                    pendientes.clear()
+
+                # El token solo avanza cuando todo lo anterior ya fue aplicado;
+                # el de un invalidate no sirve para reanudar
+                if not invalidado and stream.resume_token not in (None, ultimo_token):
+                    ultimo_token = stream.resume_token
+                    guardar_token(db, ultimo_token)
+
+    # Sin errores, el stream solo termina cuando la colección deja de existir
+    motivo = invalidado or "cerrado por el servidor"
+    print(f"\n❌ El change stream terminó ({motivo})")
+    print("   Al regenerar 'tickets' ejecuta 'python Scripts/update_tickets.py' y")
+    print("   reinicia con --desde-ahora")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Mantiene los campos desnormalizados de 'tickets' al día "
+        "escuchando un change stream (requiere replica set)"
+    )
+    parser.add_argument(
+        "--uri",
+        default=MONGO_URI,
+        help="URI de MongoDB (default: la misma de update_tickets.py)",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=500,
+        help="Tickets distintos a acumular antes de recalcular (default: 500)",
+    )
+    parser.add_argument(
+        "--espera",
+        type=float,
+        default=1.0,
+        help="Segundos máximos antes de recalcular un lote incompleto (default: 1)",
+    )
+    parser.add_argument(
+        "--reintentos",
+        type=int,
+        default=3,
+        help="Reintentos de un lote con errores antes de detenerse (default: 3)",
+    )
+    parser.add_argument(
+        "--desde-ahora",
+        action="store_true",
+        help="Ignorar el resume token guardado y empezar desde el momento actual",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("📡 SINCRONIZACIÓN CONTINUA DE CAMPOS DESNORMALIZADOS")
+    print("=" * 60)
+
+    db = MongoClient(args.uri)["capta_tickets"]
+
+    try:
+        sincronizar(db, args.lote, args.espera, args.desde_ahora, args.reintentos)
+    except KeyboardInterrupt:
+        print("\n⏹️  Sincronización detenida")
+    except OperationFailure as e:
+        if e.code == CHANGE_STREAM_HISTORY_LOST:
+            print("\n❌ El resume token ya no está en el oplog")
+            print("   Ejecuta 'python Scripts/update_tickets.py --incremental' y")
+            print("   reinicia con --desde-ahora")
+        else:
+            print(f"\n❌ Error en el change stream: {e}")
+    except PyMongoError as e:
+        print(f"\n❌ Error de MongoDB: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+from pymongo import MongoClient
+from bson import json_util
+import argparse
+import math
+import time
+
+from desnormalizacion import (
+    CAMPOS_DESNORMALIZADOS,
+    expresiones_desnormalizacion,
+    pipeline_desnormalizacion,
+)
+from update_tickets import MONGO_URI, construir_filtro
+
+client = MongoClient(MONGO_URI)
+db = client["capta_tickets"]
+
+Z_95 = 1.96
+
+
+def pipeline_desviaciones(filtro=None, tamano_muestra=None):
+    pipeline = []
+
+    if filtro:
+        pipeline.append({"$match": filtro})
+    if tamano_muestra:
+        pipeline.append({"$sample": {"size": tamano_muestra}})
+
+    # Cada campo aparece en "campos" solo si su valor guardado no coincide
+    # con el recalculado a partir de history
+    diferencias = [
+        {"$cond": [{"$ne": [f"$_esperado.{campo}", f"${campo}"]}, campo, None]}
+        for campo in CAMPOS_DESNORMALIZADOS
+    ]
+
+    pipeline += [
+        {
+            "$project": {
+                **{campo: 1 for campo in CAMPOS_DESNORMALIZADOS},
+                "history": 1,
+                "currentState": 1,
+                "createdAt": 1,
+            }
+        },
+        {"$set": {"_esperado": expresiones_desnormalizacion()}},
+        {
+            "$project": {
+                "campos": {
+                    "$filter": {
+                        "input": diferencias,
+                        "cond": {"$ne": ["$$this", None]},
+                    }
+                }
+            }
+        },
+        {"$match": {"campos.0": {"$exists": True}}},
+    ]
+
+    return pipeline
+
+
+def intervalo_wilson(desviados, examinados, z=Z_95):
+    if examinados == 0:
+        return 0.0, 1.0
+
+    p = desviados / examinados
+    denominador = 1 + z**2 / examinados
+    centro = (p + z**2 / (2 * examinados)) / denominador
+    margen = (
+        z
+        * math.sqrt(p * (1 - p) / examinados + z**2 / (4 * examinados**2))
+        / denominador
+    )
+    return max(0.0, centro - margen), min(1.0, centro + margen)
+
+
+def reparar(ids):
+    result = db.tickets.update_many({"_id": {"$in": ids}}, pipeline_desnormalizacion())
+    return result.modified_count
+
+
+def verificar(
+    filtro=None, muestra=None, reparar_desviados=False, mostrar=20, lote=1000
+):
+    if filtro:
+        total = db.tickets.count_documents(filtro)
+    else:
+        total = db.tickets.estimated_document_count()
+
+    tamano_muestra = None
+    if muestra:
+        tamano_muestra = max(1, math.ceil(total * muestra))
+        print(f"\n🎲 Muestra aleatoria de {tamano_muestra} de ~{total} tickets")
+    else:
+        print(f"\n🔍 Verificando ~{total} tickets")
+
+    examinados = min(tamano_muestra, total) if tamano_muestra else total
+    desviados = 0
+    reparados = 0
+    por_campo = {campo: 0 for campo in CAMPOS_DESNORMALIZADOS}
+    pendientes = []
+    inicio = time.perf_counter()
+
+    cursor = db.tickets.aggregate(
+        pipeline_desviaciones(filtro, tamano_muestra), allowDiskUse=True
+    )
+
+    for documento in cursor:
+        desviados += 1
+        for campo in documento["campos"]:
+            por_campo[campo] += 1
+
+        if desviados <= mostrar:
+            print(f"  ❌ {documento['_id']}: {', '.join(documento['campos'])}")
+
+        if reparar_desviados:
+            pendientes.append(documento["_id"])
+            if len(pendientes) >= lote:
+                reparados += reparar(pendientes)
+                pendientes = []
+
+    if pendientes:
+        reparados += reparar(pendientes)
+
+    transcurrido = time.perf_counter() - inicio
+
+    if desviados > mostrar:
+        print(f"  ... y {desviados - mostrar} tickets más")
+
+    print("\n" + "=" * 60)
+    print("📋 RESULTADO DE LA VERIFICACIÓN")
+    print("=" * 60)
+    print(f"\nExaminados: {examinados} en {transcurrido:.1f}s")
+    print(f"Con desviaciones: {desviados}")
+    for campo, cantidad in por_campo.items():
+        if cantidad:
+            print(f"  • {campo}: {cantidad}")
+
+    if tamano_muestra and examinados:
+        bajo, alto = intervalo_wilson(desviados, examinados)
+        print(
+            f"\n📈 Tasa de desviación estimada: {desviados / examinados:.3%} "
+            f"(IC 95%: {bajo:.3%} - {alto:.3%})"
+        )
+        print(
+            f"   Tickets desviados estimados en la colección: "
+            f"{bajo * total:,.0f} - {alto * total:,.0f}"
+        )
+
+    if reparar_desviados:
+        print(f"\n🔧 Reparados: {reparados}")
+
+    return {"examinados": examinados, "desviados": desviados, "reparados": reparados}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Verifica que los campos desnormalizados coincidan con history "
+        "sin reescribir los tickets"
+    )
+    parser.add_argument(
+        "--muestra",
+        type=float,
+        default=None,
+        help="Fracción de tickets a verificar al azar, p. ej. 0.01 para 1%%",
+    )
+    parser.add_argument(
+        "--reparar",
+        action="store_true",
+        help="Recalcular en el servidor solo los tickets con desviaciones",
+    )
+    parser.add_argument(
+        "--mostrar",
+        type=int,
+        default=20,
+        help="Cantidad de _id desviados a listar (default: 20)",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=1000,
+        help="Tickets por cada update_many de reparación (default: 1000)",
+    )
+    parser.add_argument(
+        "--filtro",
+        default=None,
+        help="Filtro en Extended JSON para acotar la verificación",
+    )
+    parser.add_argument("--desde-id", default=None)
+    parser.add_argument("--hasta-id", default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("🩺 VERIFICACIÓN DE CAMPOS DESNORMALIZADOS")
+    print("=" * 60)
+
+    filtro = construir_filtro(args.filtro, args.desde_id, args.hasta_id)
+    if filtro:
+        print(f"\n🔎 Filtro: {json_util.dumps(filtro)}")
+
+    resultado = verificar(filtro, args.muestra, args.reparar, args.mostrar, args.lote)
+
+    if resultado["desviados"] == 0:
+        print("\n✅ Todos los campos examinados coinciden con history")
+    elif not args.reparar:
+        print("\n💡 Usa --reparar para corregir solo los tickets desviados")
+
+
+if __name__ == "__main__":
+    main()
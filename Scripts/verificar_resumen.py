@@ -0,0 +1,245 @@
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
+import argparse
+import random
+import sys
+
+from capta_tickets import (
+    CLASIFICADORES,
+    generar_tickets_stream,
+    insertar_lote_tickets,
+    limpiar_tickets,
+)
+from eventos import COLECCION_EVENTOS
+from resumen_diario import (
+    COLECCION_RESUMEN,
+    CONTADORES,
+    acumular_tickets,
+    contribuciones_anteriores,
+    id_resumen,
+)
+from update_tickets import MONGO_URI, backfill_tickets
+
+BASE_PRUEBA = "capta_tickets_prueba"
+
+ESCENARIOS = [COLECCION_RESUMEN, COLECCION_EVENTOS]
+
+
+class ColeccionConFallo:
+    """Aplica la primera mitad del próximo bulk_write y falla con el resto,
+    como un lote desordenado con errores de escritura"""
+
+    def __init__(self, coleccion):
+        self._coleccion = coleccion
+        self.pendiente = True
+
+    def __getattr__(self, name):
+        return getattr(self._coleccion, name)
+
+    def bulk_write(self, operaciones, *args, **kwargs):
+        if not self.pendiente or len(operaciones) < 2:
+            return self._coleccion.bulk_write(operaciones, *args, **kwargs)
+
+        self.pendiente = False
+        mitad = len(operaciones) // 2
+        self._coleccion.bulk_write(operaciones[:mitad], *args, **kwargs)
+        errores = [
+            {"index": i, "code": 91, "errmsg": "fallo inyectado"}
+            for i in range(mitad, len(operaciones))
+        ]
+        raise BulkWriteError({"writeErrors": errores, "nModified": 0})
+
+
+class BaseConFallo:
+    def __init__(self, db, nombre):
+        self._db = db
+        self.coleccion_con_fallo = ColeccionConFallo(db[nombre])
+        self._nombre = nombre
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def __getitem__(self, name):
+        if name == self._nombre:
+            return self.coleccion_con_fallo
+        return self._db[name]
+
+
+class TicketsConFallo:
+    def __init__(self, db, nombre):
+        self._coleccion = db.tickets
+        self.database = BaseConFallo(db, nombre)
+
+    def __getattr__(self, name):
+        return getattr(self._coleccion, name)
+
+
+def documentos_resumen(acumulado):
+    return {
+        id_resumen(clave): {contador: bucket[contador] for contador in CONTADORES}
+        for clave, bucket in acumulado.items()
+        if any(bucket[contador] for contador in CONTADORES)
+    }
+
+
+def resumen_de_tickets(db):
+    return documentos_resumen(acumular_tickets(db.tickets.find()))
+
+
+def resumen_de_eventos(db):
+    eventos = db[COLECCION_EVENTOS]
+    return documentos_resumen(
+        contribuciones_anteriores(eventos, eventos.distinct("ticketId"))
+    )
+
+
+def resumen_guardado(db):
+    return {
+        documento["_id"]: {contador: documento[contador] for contador in CONTADORES}
+        for documento in db[COLECCION_RESUMEN].find()
+        if any(documento[contador] for contador in CONTADORES)
+    }
+
+
+def desviaciones(db, esperado):
+    guardado = resumen_guardado(db)
+    return sorted(
+        clave
+        for clave in esperado.keys() | guardado.keys()
+        if esperado.get(clave) != guardado.get(clave)
+    )
+
+
+def modificar_tickets(db, rng, fraccion):
+    # Cierra o reabre una parte de los tickets y reclasifica algunos, como
+    # lo haría la aplicación entre dos ejecuciones
+    operaciones = []
+    for ticket in db.tickets.find({}, {"history": 1, "currentState": 1}):
+        if rng.random() >= fraccion:
+            continue
+
+        ultima = max(accion["timestamp"] for accion in ticket["history"])
+        estado = ticket.get("currentState", "open")
+        destino = "open" if estado == "closed" else "closed"
+        cambios = {
+            "$push": {
+                "history": {
+                    "action": "state_change",
+                    "timestamp": ultima + timedelta(hours=rng.randint(1, 72)),
+                    "from": estado,
+                    "to": destino,
+                }
+            }
+        }
+        if rng.random() < 0.3:
+            cambios["$set"] = {
+                "currentClassifications.tipo_solicitud": rng.choice(CLASIFICADORES)
+            }
+        operaciones.append(UpdateOne({"_id": ticket["_id"]}, cambios))
+
+    if operaciones:
+        db.tickets.bulk_write(operaciones, ordered=False)
+    return len(operaciones)
+
+
+def probar_escenario(db, nombre, cantidad, tamano_lote, semilla):
+    print(f"\n🧪 Fallo parcial en '{nombre}'")
+    rng = random.Random(semilla)
+
+    limpiar_tickets(db)
+    tickets = list(
+        generar_tickets_stream(cantidad, datetime(2025, 1, 1), semilla=semilla)
+    )
+    for inicio in range(0, len(tickets), tamano_lote):
+        insertar_lote_tickets(db, tickets[inicio : inicio + tamano_lote])
+
+    modificados = modificar_tickets(db, rng, 0.3)
+    print(f"  {modificados} tickets modificados")
+
+    coleccion = TicketsConFallo(db, nombre)
+    # Tras el fallo el resumen debe coincidir con lo que quedó en
+    # ticket_events; el reintento del rango, como en backfill_paralelo, y una
+    # ejecución normal posterior deben dejarlo igual a los tickets
+    pasos = [
+        ("con fallo", coleccion, resumen_de_eventos),
+        ("reintento", db.tickets, resumen_de_tickets),
+        ("repetición", db.tickets, resumen_de_tickets),
+    ]
+
+    correcto = True
+    for paso, tickets_paso, esperado in pasos:
+        resultado = backfill_tickets(
+            tickets_paso, tamano_lote=tamano_lote, mostrar_progreso=False
+        )
+        desviados = desviaciones(db, esperado(db))
+        print(
+            f"  {paso}: {resultado['procesados']} tickets, "
+            f"{resultado['errores']} errores, {len(desviados)} documentos desviados"
+        )
+        correcto &= not desviados
+
+    if coleccion.database.coleccion_con_fallo.pendiente:
+        print("  ❌ El fallo no llegó a inyectarse")
+        return False
+    return correcto
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=f"Inyecta fallos parciales de escritura en '{COLECCION_RESUMEN}' "
+        f"y '{COLECCION_EVENTOS}', reintenta y comprueba que el resumen coincide "
+        "con los tickets"
+    )
+    parser.add_argument(
+        "--uri",
+        default=MONGO_URI,
+        help="URI de MongoDB (default: la misma de update_tickets.py)",
+    )
+    parser.add_argument(
+        "--base",
+        default=BASE_PRUEBA,
+        help=f"Base de datos de prueba, se vacía en cada escenario (default: {BASE_PRUEBA})",
+    )
+    parser.add_argument(
+        "-n",
+        "--tickets",
+        type=int,
+        default=2000,
+        help="Tickets generados por escenario (default: 2000)",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=250,
+        help="Tickets por lote (default: 250)",
+    )
+    parser.add_argument("--semilla", type=int, default=7)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.base == "capta_tickets":
+        print("❌ La prueba borra la base; usa una distinta de 'capta_tickets'")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("🧪 REINTENTOS DEL RESUMEN DIARIO")
+    print("=" * 60)
+
+    db = MongoClient(args.uri)[args.base]
+    resultados = [
+        probar_escenario(db, nombre, args.tickets, args.lote, args.semilla)
+        for nombre in ESCENARIOS
+    ]
+
+    if all(resultados):
+        print("\n✅ El resumen coincide con los tickets tras cada reintento")
+    else:
+        print("\n❌ El resumen se desvió de los tickets")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
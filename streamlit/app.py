@@ -81,11 +81,8 @@ col_a, col_b, col_c = st.columns(3)
 
 with col_a:
     queries = TicketQueries(db)
-    total_ingresos = queries.db.tickets.count_documents(
-        {
-            "createdAt": {"$gte": start_date, "$lte": end_date},
-            **({"currentState": estado} if estado != "Todos" else {}),
-        }
+    total_ingresos = queries.get_intakes_in_period(
+        start_date, end_date, estado, clasificador
     )
     st.metric("📥 Ingresos", total_ingresos, delta="en período")
 
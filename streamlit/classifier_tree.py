@@ -0,0 +1,133 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+import threading
+import time
+
+# Los scripts que reescriben 'classifiers' incrementan este contador
+VERSIONS_COLLECTION = "metadata"
+CLASSIFIERS_VERSION_ID = "classifiers"
+
+TREE_TTL = 300
+VERSION_CHECK_INTERVAL = 5
+LISTING_MIN_LEVEL = 2
+
+_PROJECTION = {"_id": 1, "parentId": 1, "level": 1, "name": 1}
+
+
+class ClassifierTree:
+    """Árbol de clasificadores en memoria con subárboles contiguos"""
+
+    def __init__(self, nodes: Iterable[Dict[str, Any]]):
+        children = defaultdict(list)
+        listing = []
+
+        for node in nodes:
+            children[node.get("parentId")].append(node["_id"])
+            if node.get("level", 0) >= LISTING_MIN_LEVEL:
+                listing.append((node.get("name", ""), node["_id"]))
+
+        # Recorrido en preorden: los descendientes de un nodo quedan en un
+        # tramo contiguo de self._order, así que cada consulta es un slice
+        self._order: List[str] = []
+        self._span: Dict[str, tuple] = {}
+
+        # Un nodo cuyo padre no existe se trata como raíz
+        ids = {child for kids in children.values() for child in kids}
+        roots = [
+            child
+            for parent, kids in children.items()
+            if parent is None or parent not in ids
+            for child in kids
+        ]
+        stack = [(root, False) for root in sorted(roots, reverse=True)]
+
+        while stack:
+            node_id, closing = stack.pop()
+            if closing:
+                self._span[node_id] = (self._span[node_id], len(self._order))
+                continue
+
+            self._span[node_id] = len(self._order)
+            self._order.append(node_id)
+            stack.append((node_id, True))
+            stack.extend(
+                (child, False) for child in sorted(children[node_id], reverse=True)
+            )
+
+        self._listing = [node_id for _, node_id in sorted(listing)]
+
+    def __len__(self):
+        return len(self._order)
+
+    def descendants(self, node_id: str) -> List[str]:
+        """El nodo seguido de todos sus descendientes"""
+        if node_id not in self._span:
+            return [node_id]
+        start, end = self._span[node_id]
+        return self._order[start:end]
+
+    def listing(self) -> List[str]:
+        """Clasificadores seleccionables en el dashboard, ordenados por nombre"""
+        return list(self._listing)
+
+
+class _CacheEntry:
+    def __init__(self, tree, version, now):
+        self.tree = tree
+        self.version = version
+        self.loaded_at = now
+        self.checked_at = now
+
+
+_trees: Dict[tuple, _CacheEntry] = {}
+_lock = threading.Lock()
+
+
+def _current_version(collection) -> tuple:
+    # El contador cubre las recargas hechas por los scripts; el conteo
+    # estimado (solo metadatos) detecta altas y bajas hechas por fuera
+    meta = collection.database[VERSIONS_COLLECTION].find_one(
+        {"_id": CLASSIFIERS_VERSION_ID}
+    )
+    return (
+        meta.get("version") if meta else None,
+        collection.estimated_document_count(),
+    )
+
+
+def get_classifier_tree(
+    collection,
+    ttl: float = TREE_TTL,
+    check_interval: float = VERSION_CHECK_INTERVAL,
+) -> ClassifierTree:
+    """Árbol compartido por el proceso, recargado por TTL o cambio de versión"""
+    key = (id(collection.database.client), collection.full_name)
+    now = time.monotonic()
+
+    with _lock:
+        entry = _trees.get(key)
+        if entry is not None and now - entry.loaded_at < ttl:
+            if now - entry.checked_at < check_interval:
+                return entry.tree
+
+            version = _current_version(collection)
+            entry.checked_at = now
+            if version == entry.version:
+                return entry.tree
+        else:
+            version = _current_version(collection)
+
+        # La versión se lee antes de cargar: un cambio concurrente hace que
+        # la próxima comprobación vuelva a recargar
+        tree = ClassifierTree(collection.find({}, _PROJECTION))
+        _trees[key] = _CacheEntry(tree, version, now)
+        return tree
+
+
+def invalidate_classifier_tree(collection: Optional[Any] = None):
+    """Descarta el árbol de una colección, o todos si no se indica"""
+    with _lock:
+        if collection is None:
+            _trees.clear()
+        else:
+            _trees.pop((id(collection.database.client), collection.full_name), None)
@@ -1,13 +1,25 @@
 import streamlit as st
 from pymongo import MongoClient
-from config import MONGO_URI, DB_NAME
+from pymongo.errors import OperationFailure
+from config import MONGO_URI, DB_NAME, ENSURE_INDEXES
+from indexes import ensure_indexes
 
 
 @st.cache_resource
 def get_mongo_connection():
     """Obtiene conexión cached a MongoDB"""
     client = MongoClient(MONGO_URI)
-    return client[DB_NAME]
+    db = client[DB_NAME]
+    if not ENSURE_INDEXES:
+        return db
+
+    # Construir índices bloquea la primera petición; solo si se pide
+    try:
+        ensure_indexes(db)
+    except OperationFailure as e:
+        # Un usuario de solo lectura no puede crear índices; el dashboard sigue
+        print(f"⚠️  No se pudieron asegurar los índices: {e}")
+    return db
 
 
 def get_db():
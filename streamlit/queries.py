@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from classifier_tree import get_classifier_tree
 
 
 class TicketQueries:
@@ -12,15 +13,11 @@ class TicketQueries:
         """Obtiene clasificadores descendientes"""
         if node_id == "Todos":
             return None
-        descendants = list(self.db.classifiers.find({"ancestors": node_id}))
-        return [node_id] + [d["_id"] for d in descendants]
+        return get_classifier_tree(self.db.classifiers).descendants(node_id)
 
     def get_all_classifiers(self) -> List[str]:
         """Obtiene todos los clasificadores"""
-        classifiers = list(
-            self.db.classifiers.find({"level": {"$gte": 2}}).sort("name", 1)
-        )
-        return ["Todos"] + [c["_id"] for c in classifiers]
+        return ["Todos"] + get_classifier_tree(self.db.classifiers).listing()
 
     def build_match_query(
         self,
@@ -36,10 +33,10 @@ class TicketQueries:
         if estado != "Todos":
             query["currentState"] = estado
 
+        # classifierPath contiene la ruta completa del clasificador del ticket,
+        # así que un nodo cubre todo su subárbol con una igualdad
         if clasificador != "Todos":
-            descendientes = self.get_descendant_classifiers(clasificador)
-            if descendientes:
-                query["currentClassifications.tipo_solicitud"] = {"$in": descendientes}
+            query["classifierPath"] = clasificador
 
         if only_date_range:
             query["createdAt"] = {"$gte": start_date, "$lte": end_date}
@@ -59,43 +56,35 @@ class TicketQueries:
         return self.db.tickets.count_documents({**match_query, "currentState": state})
 
     def get_metrics(self, start_date, end_date, estado, clasificador):
-        """Obtiene todas las métricas - AHORA CON FILTRO DE FECHA"""
+        """Obtiene todas las métricas en una sola agregación"""
         query = self.build_match_query(start_date, end_date, estado, clasificador)
 
         # Agregar filtro de fecha a la query base
         query["createdAt"] = {"$gte": start_date, "$lte": end_date}
 
-        total = self.db.tickets.count_documents(query)
-
-        # Para contar por estado, necesitamos manejar el filtro de estado correctamente
-        if estado != "Todos":
-            abiertos = total if estado == "open" else 0
-            en_progreso = total if estado == "in_progress" else 0
-            cerrados = total if estado == "closed" else 0
-        else:
-            abiertos = self.db.tickets.count_documents(
-                {**query, "currentState": "open"}
-            )
-            en_progreso = self.db.tickets.count_documents(
-                {**query, "currentState": "in_progress"}
-            )
-            cerrados = self.db.tickets.count_documents(
-                {**query, "currentState": "closed"}
-            )
-
+        # Un grupo por estado da el total, cada estado y las reaperturas a la
+        # vez; con filtro de estado solo llega el grupo de ese estado
         pipeline = [
             {"$match": query},
-            {"$group": {"_id": None, "total": {"$sum": "$reopenCount"}}},
+            {
+                "$group": {
+                    "_id": "$currentState",
+                    "count": {"$sum": 1},
+                    "reaperturas": {"$sum": "$reopenCount"},
+                }
+            },
         ]
-        reaperturas_result = list(self.db.tickets.aggregate(pipeline))
-        reaperturas = reaperturas_result[0]["total"] if reaperturas_result else 0
+        por_estado = {r["_id"]: r for r in self.db.tickets.aggregate(pipeline)}
+
+        def contar(state):
+            return por_estado[state]["count"] if state in por_estado else 0
 
         return {
-            "total": total,
-            "abiertos": abiertos,
-            "en_progreso": en_progreso,
-            "cerrados": cerrados,
-            "reaperturas": reaperturas,
+            "total": sum(r["count"] for r in por_estado.values()),
+            "abiertos": contar("open"),
+            "en_progreso": contar("in_progress"),
+            "cerrados": contar("closed"),
+            "reaperturas": sum(r["reaperturas"] for r in por_estado.values()),
         }
 
     def get_tickets_by_classifier(self, start_date, end_date, estado, clasificador):
@@ -119,28 +108,63 @@ class TicketQueries:
 
         return list(self.db.tickets.aggregate(pipeline))
 
+    def build_daily_stats_query(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        estado: str,
+        clasificador: str,
+    ) -> Dict[str, Any]:
+        """Construye query sobre el resumen diario"""
+        day_start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        query = {"day": {"$gte": day_start, "$lte": end_date}}
+
+        if estado != "Todos":
+            query["state"] = estado
+
+        if clasificador != "Todos":
+            query["classifierPath"] = clasificador
+
+        return query
+
+    def sum_daily_stats(self, field, start_date, end_date, estado, clasificador):
+        """Suma un contador del resumen diario en el período"""
+        query = self.build_daily_stats_query(start_date, end_date, estado, clasificador)
+        pipeline = [
+            {"$match": query},
+            {"$group": {"_id": None, "total": {"$sum": f"${field}"}}},
+        ]
+        result = list(self.db.daily_stats.aggregate(pipeline))
+        return result[0]["total"] if result else 0
+
     def get_tickets_trend(self, start_date, end_date, estado, clasificador):
         """Obtiene tendencia de creación de tickets"""
-        query = self.build_match_query(
-            start_date, end_date, estado, clasificador, only_date_range=True
-        )
+        query = self.build_daily_stats_query(start_date, end_date, estado, clasificador)
 
         pipeline = [
             {"$match": query},
             {
                 "$group": {
                     "_id": {
-                        "year": {"$year": "$createdAt"},
-                        "month": {"$month": "$createdAt"},
-                        "day": {"$dayOfMonth": "$createdAt"},
+                        "year": {"$year": "$day"},
+                        "month": {"$month": "$day"},
+                        "day": {"$dayOfMonth": "$day"},
                     },
-                    "count": {"$sum": 1},
+                    "count": {"$sum": "$created"},
                 }
             },
+            # Días con solo cierres o reaperturas no tienen ingresos
+            {"$match": {"count": {"$gt": 0}}},
             {"$sort": {"_id": 1}},
         ]
 
-        return list(self.db.tickets.aggregate(pipeline))
+        return list(self.db.daily_stats.aggregate(pipeline))
+
+    def get_intakes_in_period(self, start_date, end_date, estado, clasificador):
+        """Obtiene cantidad de ingresos en período"""
+        return self.sum_daily_stats(
+            "created", start_date, end_date, estado, clasificador
+        )
 
     def get_tickets_list(self, start_date, end_date, estado, clasificador, limit=50):
         """Obtiene lista de tickets"""
@@ -153,11 +177,7 @@ class TicketQueries:
         }
 
         if clasificador != "Todos":
-            descendientes = self.get_descendant_classifiers(clasificador)
-            if descendientes:
-                match_query["currentClassifications.tipo_solicitud"] = {
-                    "$in": descendientes
-                }
+            match_query["classifierPath"] = clasificador
 
         if estado != "Todos":
             match_query["currentState"] = estado
@@ -169,10 +189,21 @@ class TicketQueries:
     def get_reopenings_stats(self, estado, clasificador):
         """Obtiene estadísticas de reaperturas"""
         query = self.build_match_query(None, None, estado, clasificador)
-        total = self.db.tickets.count_documents(query)
-        con_reaperturas = self.db.tickets.count_documents(
-            {**query, "reopenCount": {"$gt": 0}}
-        )
+        pipeline = [
+            {"$match": query},
+            {
+                "$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "con_reaperturas": {
+                        "$sum": {"$cond": [{"$gt": ["$reopenCount", 0]}, 1, 0]}
+                    },
+                }
+            },
+        ]
+        result = list(self.db.tickets.aggregate(pipeline))
+        total = result[0]["total"] if result else 0
+        con_reaperturas = result[0]["con_reaperturas"] if result else 0
         return {
             "con_reaperturas": con_reaperturas,
             "sin_reaperturas": total - con_reaperturas,
@@ -216,79 +247,49 @@ class TicketQueries:
 
     def get_closures_in_period(self, start_date, end_date, clasificador):
         """Obtiene cantidad de cierres en período"""
-        query = {}
-        if clasificador != "Todos":
-            descendientes = self.get_descendant_classifiers(clasificador)
-            if descendientes:
-                query["currentClassifications.tipo_solicitud"] = {"$in": descendientes}
-
-        pipeline = [
-            {"$match": query} if query else {"$match": {}},
-            {"$unwind": "$history"},
-            {
-                "$match": {
-                    "history.action": "state_change",
-                    "history.to": "closed",
-                    "history.timestamp": {"$gte": start_date, "$lte": end_date},
-                }
-            },
-            {"$count": "total"},
-        ]
-
-        result = list(self.db.tickets.aggregate(pipeline))
-        return result[0]["total"] if result else 0
+        return self.sum_daily_stats(
+            "closed", start_date, end_date, "Todos", clasificador
+        )
 
     def get_reopenings_in_period(self, start_date, end_date, clasificador):
         """Obtiene cantidad de reaperturas en período"""
-        query = {}
-        if clasificador != "Todos":
-            descendientes = self.get_descendant_classifiers(clasificador)
-            if descendientes:
-                query["currentClassifications.tipo_solicitud"] = {"$in": descendientes}
-
-        pipeline = [
-            {"$match": query} if query else {"$match": {}},
-            {"$unwind": "$history"},
-            {
-                "$match": {
-                    "history.action": "state_change",
-                    "history.from": "closed",
-                    "history.to": {"$ne": "closed"},
-                    "history.timestamp": {"$gte": start_date, "$lte": end_date},
-                }
-            },
-            {"$count": "total"},
-        ]
-
-        result = list(self.db.tickets.aggregate(pipeline))
-        return result[0]["total"] if result else 0
+        return self.sum_daily_stats(
+            "reopened", start_date, end_date, "Todos", clasificador
+        )
 
     def get_recent_actions(self, start_date, end_date, clasificador, limit=100):
         """Obtiene acciones recientes"""
-        query = {"history.timestamp": {"$gte": start_date, "$lte": end_date}}
+        query = {"timestamp": {"$gte": start_date, "$lte": end_date}}
 
         if clasificador != "Todos":
-            descendientes = self.get_descendant_classifiers(clasificador)
-            if descendientes:
-                query["currentClassifications.tipo_solicitud"] = {"$in": descendientes}
+            query["classifierPath"] = clasificador
 
         pipeline = [
             {"$match": query},
-            {"$unwind": "$history"},
-            {"$match": {"history.timestamp": {"$gte": start_date, "$lte": end_date}}},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": limit},
+            # El título se busca solo para las acciones que se muestran
+            {
+                "$lookup": {
+                    "from": "tickets",
+                    "localField": "ticketId",
+                    "foreignField": "_id",
+                    "pipeline": [{"$project": {"title": 1}}],
+                    "as": "ticket",
+                }
+            },
             {
                 "$project": {
-                    "ticketId": "$_id",
-                    "titulo": "$title",
-                    "accion": "$history.action",
-                    "timestamp": "$history.timestamp",
-                    "usuario": "$history.userId",
-                    "desde": "$history.from",
-                    "hacia": "$history.to",
+                    "_id": "$ticketId",
+                    "ticketId": 1,
+                    "titulo": {"$first": "$ticket.title"},
+                    "accion": "$action",
+                    "timestamp": 1,
+                    "usuario": "$userId",
+                    "desde": "$from",
+                    "hacia": "$to",
                 }
             },
-            {"$sort": {"timestamp": -1}},
-            {"$limit": limit},
         ]
 
-        return list(self.db.tickets.aggregate(pipeline))
+        return list(self.db.ticket_events.aggregate(pipeline))